@@ -0,0 +1,85 @@
+"""
+Cold storage for raw chat logs of days that are already summarized.
+
+Database.archive_days moves such days out of logs_uncleaned into logs_archive, one compressed blob
+per logical day; get_uncleaned_logs_between / get_uncleaned_logs_for_day read them back transparently.
+AccountabilityAI archives days older than archive_retention_days after each backfill. From the shell:
+
+    python archive.py                        # archive summarized days older than 30 days
+    python archive.py --retention-days 90 --codec lzma
+    python archive.py --vacuum               # ...then checkpoint the WAL and VACUUM the file
+    python archive.py --stats                # only report hot / archived sizes
+"""
+import argparse
+import json
+import zlib
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+# one row as stored in a blob: (id, role, message, created_at)
+ArchivedRow = Tuple[int, str, str, str]
+
+CODECS = ("zlib", "lzma")
+DEFAULT_CODEC = "zlib"
+DEFAULT_RETENTION_DAYS = 30
+
+
+def pack_logs(rows: List[ArchivedRow], codec: str = DEFAULT_CODEC) -> bytes:
+    """Serialize a day's rows (oldest first) and compress them with `codec`."""
+    raw = json.dumps(rows, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if codec == "zlib":
+        return zlib.compress(raw, 9)
+    if codec == "lzma":
+        import lzma  # only paid for by people who pick it
+
+        return lzma.compress(raw, preset=6)
+    raise ValueError(f"unknown archive codec {codec!r}, expected one of {CODECS}")
+
+
+def unpack_logs(payload: bytes, codec: str) -> List[ArchivedRow]:
+    if codec == "zlib":
+        raw = zlib.decompress(payload)
+    elif codec == "lzma":
+        import lzma
+
+        raw = lzma.decompress(payload)
+    else:
+        raise ValueError(f"unknown archive codec {codec!r}, expected one of {CODECS}")
+    return [tuple(r) for r in json.loads(raw)]
+
+
+def archive_cutoff_day(retention_days: float) -> str:
+    """Days strictly before this YYYY-MM-DD are old enough to archive."""
+    return (datetime.utcnow() - timedelta(days=retention_days)).date().isoformat()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="accountability.db")
+    parser.add_argument("--retention-days", type=float, default=DEFAULT_RETENTION_DAYS,
+                        help="keep this many recent days of raw messages in the hot table")
+    parser.add_argument("--codec", choices=CODECS, default=DEFAULT_CODEC)
+    parser.add_argument("--vacuum", action="store_true", help="reclaim the freed space afterwards")
+    parser.add_argument("--stats", action="store_true", help="only print table sizes")
+    args = parser.parse_args()
+
+    from database import Database
+
+    db = Database(args.db)
+    try:
+        if not args.stats:
+            days, messages = db.archive_days(archive_cutoff_day(args.retention_days), codec=args.codec)
+            print(f"archived {messages} messages from {days} days")
+            if args.vacuum:
+                before, after = db.vacuum()
+                print(f"vacuumed {args.db}: {before / 1024:.0f} KiB -> {after / 1024:.0f} KiB")
+        with db:
+            stats = db.get_archive_stats()
+        print(f"hot: {stats['hot_messages']} messages | archive: {stats['archived_messages']} messages in "
+              f"{stats['archived_days']} days, {stats['archived_bytes'] / 1024:.0f} KiB compressed")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Iterator, Optional, Callable
+
+# Pick the backend AccountabilityAI uses when none is passed in: "gemini" (default) or "fake".
+BACKEND_ENV_VAR = "MODEL_BACKEND"
+
+
+class ModelBackend(ABC):
+    """
+    What AccountabilityAI.call_ai_model talks to. Subclasses implement generate(); streaming
+    falls back to a single chunk unless overridden. `name` is part of the response cache key.
+    """
+    name = "backend"
+
+    @abstractmethod
+    def generate(self, prompt: str) -> str:
+        ...
+
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        yield self.generate(prompt)
+
+
+class GeminiBackend(ModelBackend):
+    """Google Gemini via google.generativeai. Needs GEMINI_API_KEY (from the environment or .env)."""
+    def __init__(self, model_name: str = "gemini-2.5-flash", api_key: Optional[str] = None):
+        from dotenv import load_dotenv
+        import google.generativeai as genai
+
+        load_dotenv()
+        api_key = api_key or os.getenv('GEMINI_API_KEY')
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY not found in environment variables")
+
+        genai.configure(api_key=api_key)
+        self.name = model_name
+        self.model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt: str) -> str:
+        return self.model.generate_content(prompt).text
+
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        for chunk in self.model.generate_content(prompt, stream=True):
+            text = getattr(chunk, "text", "")
+            if text:
+                yield text
+
+
+_BATCH_KEYS_RE = re.compile(r"The keys must be exactly: (.*)\.")
+
+
+class FakeBackend(ModelBackend):
+    """
+    Offline, deterministic stand-in for benchmarks and local testing.
+    Recognises the summarization prompts and answers them with well-formed JSON (the running-summary prompt
+    gets one line of text); everything else gets a templated coaching reply derived from a hash of the prompt.
+    `latency` (seconds) is slept per call and `responder` can replace the canned output entirely.
+    """
+    name = "fake"
+
+    def __init__(self, latency: float = 0.0, chunk_words: int = 4,
+                 responder: Optional[Callable[[str], str]] = None,
+                 reply_template: str = "Noted. Based on your goals, your next step is {step}. ({tag})"):
+        self.latency = latency
+        self.chunk_words = max(1, chunk_words)
+        self.responder = responder
+        self.reply_template = reply_template
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate(self, prompt: str) -> str:
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.responder is not None:
+            return self.responder(prompt)
+        return self._canned(prompt)
+
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        words = self.generate(prompt).split(" ")
+        for i in range(0, len(words), self.chunk_words):
+            chunk = " ".join(words[i:i + self.chunk_words])
+            yield chunk if i + self.chunk_words >= len(words) else chunk + " "
+
+    def _canned(self, prompt: str) -> str:
+        tag = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8]
+        batch = _BATCH_KEYS_RE.search(prompt)
+        if batch:
+            days = batch.group(1).split(", ")
+            return json.dumps({day: [{"goal_id": None, "summary": f"Summary for {day} ({tag})"}] for day in days})
+        if prompt.startswith("You maintain the running summary"):
+            return f"The user has been checking in on their goals and agreed on next steps. ({tag})"
+        if "summarization assistant" in prompt:
+            return json.dumps([{"goal_id": None, "summary": f"Summary ({tag})"}])
+        steps = ["block an hour tomorrow morning", "split the task into three parts", "review what got in the way"]
+        return self.reply_template.format(step=steps[int(tag, 16) % len(steps)], tag=tag)
+
+
+def backend_from_env() -> ModelBackend:
+    """Backend named by MODEL_BACKEND ("gemini" or "fake"), defaulting to Gemini."""
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    choice = os.getenv(BACKEND_ENV_VAR, "gemini").lower()
+    if choice == "fake":
+        return FakeBackend(latency=float(os.getenv("FAKE_MODEL_LATENCY", "0") or 0))
+    return GeminiBackend()
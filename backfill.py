@@ -0,0 +1,195 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional, Callable
+
+from tracing import tracer
+
+
+class RateLimiter:
+    """
+    Spaces calls out to at most `rate_per_sec` per second across all threads.
+    rate_per_sec=None (or 0) disables limiting.
+    """
+    def __init__(self, rate_per_sec: Optional[float] = None):
+        self.interval = 1.0 / rate_per_sec if rate_per_sec else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def pack_batches(plan: List[tuple], batch_chars: int, batch_days: int) -> List[List[tuple]]:
+    """
+    Group consecutive fresh (day_iso, logs, None) entries into batches of at most batch_days days whose
+    combined message text stays under batch_chars. A day bigger than the budget gets a batch to itself,
+    as does every partially summarized day (those are incremental updates, not fresh summaries).
+    batch_chars <= 0 disables batching (one day per batch).
+    """
+    if batch_chars <= 0 or batch_days <= 1:
+        return [[entry] for entry in plan]
+    batches = []
+    current = []
+    size = 0
+    for entry in plan:
+        if entry[2] is not None:
+            batches.append([entry])
+            continue
+        day_size = sum(len(l["content"]) for l in entry[1])
+        if current and (size + day_size > batch_chars or len(current) >= batch_days):
+            batches.append(current)
+            current = []
+            size = 0
+        current.append(entry)
+        size += day_size
+    if current:
+        batches.append(current)
+    return batches
+
+
+class BackfillJob:
+    """
+    Summarizes missing days with up to `max_workers` model calls in flight.
+    Sparse days are packed several to a call (see pack_batches).
+    Each day's cleaned rows are committed in their own transaction as soon as its summary arrives,
+    so an interrupted job keeps everything it finished.
+
+    job = BackfillJob(ai, max_workers=4, rate_per_sec=2).start()   # background
+    job.progress()  -> {"total": 12, "done": 5, "failed": 0, "running": True}
+    job.wait()      -> list of inserted cleaned-log metadata
+    """
+    def __init__(self, ai, cutoff_hour: int = 4, max_workers: int = 4, rate_per_sec: Optional[float] = None,
+                 batch_chars: int = 0, batch_days: int = 14,
+                 on_progress: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.ai = ai
+        self.cutoff_hour = cutoff_hour
+        self.max_workers = max(1, max_workers)
+        self.rate_limiter = RateLimiter(rate_per_sec)
+        self.batch_chars = batch_chars
+        self.batch_days = batch_days
+        self.on_progress = on_progress
+
+        self.total = 0
+        self.done = 0
+        self.failed = 0
+        self.errors: List[str] = []
+        self.inserted: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._finished = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---- Control ----
+    def start(self) -> "BackfillJob":
+        """Run the job on a daemon thread and return immediately."""
+        self._thread = threading.Thread(target=self.run, name="backfill", daemon=True)
+        self._thread.start()
+        return self
+
+    def wait(self, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        self._finished.wait(timeout)
+        return self.inserted
+
+    def cancel(self):
+        """Stop handing out new days. Days already being summarized still finish and commit."""
+        self._cancelled.set()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and not self._finished.is_set()
+
+    def progress(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"total": self.total, "done": self.done, "failed": self.failed, "running": self.running}
+
+    # ---- Work ----
+    def run(self) -> List[Dict[str, Any]]:
+        """Plan and process every missing day in the calling thread, blocking until all are done."""
+        try:
+            with tracer.span("backfill.plan") as span:
+                plan, goals, through_id = self.ai.plan_backfill(cutoff_hour=self.cutoff_hour)
+                span.set(days=len(plan))
+            with self._lock:
+                self.total = len(plan)
+            if not plan:
+                self._archive()
+                return self.inserted
+
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="backfill") as pool:
+                futures = {
+                    pool.submit(self._summarize, batch, goals): batch
+                    for batch in pack_batches(plan, self.batch_chars, self.batch_days)
+                }
+                unfinished = set(day_iso for day_iso, _, _ in plan)
+                for future in as_completed(futures):
+                    batch = futures[future]
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        for day_iso, _, _ in batch:
+                            self._record(failed=True, error=f"{day_iso}: {e}")
+                        continue
+                    if results is None:
+                        continue  # cancelled before it started
+
+                    for day_iso, logs, _ in batch:
+                        try:
+                            with tracer.span("backfill.store_day", day=day_iso, messages=len(logs)):
+                                rows = self.ai.store_day_summaries(day_iso, results[day_iso], last_log_id=logs[-1]["id"])
+                        except Exception as e:
+                            self._record(failed=True, error=f"{day_iso}: {e}")
+                            continue
+                        self._record(rows=rows)
+                        unfinished.discard(day_iso)
+
+            # Days commit out of order, so the global watermark only moves up to just below the
+            # first message of the earliest day that didn't make it; per-day watermarks cover the rest.
+            stuck = [logs[0]["id"] for day_iso, logs, _ in plan if day_iso in unfinished]
+            self.ai.advance_summarized_through(min(stuck) - 1 if stuck else through_id)
+            self._archive()
+            return self.inserted
+        finally:
+            self._finished.set()
+
+    def _summarize(self, batch: List[tuple], goals: List[Dict[str, Any]]):
+        if self._cancelled.is_set():
+            return None
+        day_iso, logs, previous = batch[0]
+        # one span per batch; `days` says which days it covered. Every model call inside that misses the
+        # response cache waits on the limiter.
+        with tracer.span("backfill.summarize", days=[d for d, _, _ in batch], update=previous is not None):
+            if previous is not None:
+                return {day_iso: self.ai.update_day_summary(day_iso, previous, logs, goals, throttle=self.rate_limiter.wait)}
+            return self.ai.summarize_logs_for_days([(d, l) for d, l, _ in batch], goals, throttle=self.rate_limiter.wait)
+
+    def _archive(self):
+        # days summarized long enough ago move to the cold archive; a failure here shouldn't fail the backfill
+        if self._cancelled.is_set():
+            return
+        try:
+            with tracer.span("backfill.archive") as span:
+                days, messages = self.ai.archive_old_logs()
+                span.set(days=days, messages=messages)
+        except Exception as e:
+            with self._lock:
+                self.errors.append(f"archive: {e}")
+
+    def _record(self, rows: Optional[List[Dict[str, Any]]] = None, failed: bool = False, error: Optional[str] = None):
+        with self._lock:
+            if failed:
+                self.failed += 1
+                self.errors.append(error)
+            else:
+                self.done += 1
+                self.inserted.extend(rows or [])
+            snapshot = {"total": self.total, "done": self.done, "failed": self.failed, "running": True}
+        if self.on_progress:
+            self.on_progress(snapshot)
@@ -0,0 +1,274 @@
+"""
+Offline benchmarks for our own overhead: prompt building, SQLite access and backfill, with the model
+replaced by backends.FakeBackend so network latency doesn't hide regressions.
+
+    python benchmark.py                      # everything, DB queries at 10k / 100k / 1M rows
+    python benchmark.py --quick              # 10k rows only, fewer iterations
+    python benchmark.py --only db --sizes 100000
+    python benchmark.py --json bench.json    # also write the results for comparing runs
+
+Each case reports p50 / p99 latency over its iterations and the peak memory allocated by one call (tracemalloc).
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Callable, List, Dict, Any
+
+from database import Database, logical_day
+from backends import FakeBackend
+from chatbot import AccountabilityAI
+from retrieval import SummaryIndex
+
+WORDS = (
+    "run gym swim read book chapter code python project study exam essay guitar practice sleep early "
+    "diet meal walk meditate journal plan week deadline report tired stuck skipped finished started "
+    "morning evening focus distracted phone procrastinated"
+).split()
+
+GOALS = [
+    ("Run a 10k", "Run three times a week, building up to 10k by June"),
+    ("Read 20 books", "Read at least 30 pages a day"),
+    ("Ship side project", "Work on the side project for an hour every weekday"),
+    ("Learn guitar", "Practice guitar 20 minutes a day"),
+]
+
+
+# ---- Synthetic data ----
+def _sentence(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choices(WORDS, k=n))
+
+
+def make_history(db_path: str, n_messages: int, years: float = 3.0, active_ratio: float = 0.4,
+                 with_cleaned: bool = True, seed: int = 7) -> Dict[str, Any]:
+    """
+    Fill db_path with goals and n_messages chat messages spread over `years`, with messages on
+    roughly active_ratio of the days. With with_cleaned, every active day also gets cleaned logs
+    (per goal + general) and watermarks, as if backfill had already run.
+    """
+    rng = random.Random(seed)
+    db = Database(db_path, persistent=True)
+    total_days = max(1, int(365 * years))
+    start = datetime.utcnow() - timedelta(days=total_days)
+    active_days = sorted(rng.sample(range(total_days), max(1, int(total_days * active_ratio))))
+    per_day = max(1, n_messages // len(active_days))
+
+    rows = []
+    for offset in active_days:
+        base = start + timedelta(days=offset, hours=9)
+        for i in range(per_day):
+            if len(rows) >= n_messages:
+                break
+            ts = (base + timedelta(minutes=7 * i)).isoformat()
+            role = "user" if i % 2 == 0 else "assistant"
+            rows.append((role, _sentence(rng, 12 if role == "user" else 40), ts, logical_day(ts, db.cutoff_hour)))
+
+    with db.transaction() as tx:
+        for name, desc in GOALS:
+            tx.add_goal(name, desc)
+        tx.conn.executemany("INSERT INTO logs_uncleaned (role, message, created_at, day) VALUES (?, ?, ?, ?)", rows)
+
+        if with_cleaned:
+            last_ids = tx.conn.execute("SELECT day, MAX(id) FROM logs_uncleaned GROUP BY day").fetchall()
+            for day, last_id in last_ids:
+                for goal_id in range(1, len(GOALS) + 1):
+                    tx.add_cleaned_log(goal_id, _sentence(rng, 15), date=day)
+                tx.add_cleaned_log(None, _sentence(rng, 20), date=day)
+                tx.set_day_watermark(day, last_id)
+            tx.set_summarized_through_id(len(rows))
+    db.close()
+    return {"messages": len(rows), "active_days": len(active_days)}
+
+
+def copy_db(src: str, dst: str):
+    with sqlite3.connect(src) as source, sqlite3.connect(dst) as target:
+        source.backup(target)
+
+
+# ---- Measurement ----
+def measure(name: str, fn: Callable[[], Any], iterations: int, warmup: int = 1) -> Dict[str, Any]:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+
+    # allocations are measured on a separate call so tracing doesn't skew the timings
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    samples.sort()
+    result = {
+        "name": name,
+        "iterations": iterations,
+        "p50_ms": statistics.median(samples) * 1000,
+        "p99_ms": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000,
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "peak_alloc_kib": peak / 1024,
+    }
+    print(f"  {name:<48} p50 {result['p50_ms']:9.3f} ms   p99 {result['p99_ms']:9.3f} ms   "
+          f"alloc {result['peak_alloc_kib']:9.1f} KiB")
+    return result
+
+
+# ---- Suites ----
+def bench_db(workdir: str, sizes: List[int], iterations: int) -> List[Dict[str, Any]]:
+    results = []
+    for size in sizes:
+        path = os.path.join(workdir, f"db_{size}.db")
+        t0 = time.perf_counter()
+        info = make_history(path, size)
+        print(f"\n[db] {info['messages']} messages over {info['active_days']} active days "
+              f"(built in {time.perf_counter() - t0:.1f}s)")
+        db = Database(path, persistent=True)
+        index = SummaryIndex(db)
+        with db as d:
+            days = [r[0] for r in d.conn.execute("SELECT DISTINCT day FROM logs_uncleaned ORDER BY day")]
+            max_id = d.conn.execute("SELECT MAX(id) FROM logs_uncleaned").fetchone()[0]
+        mid_day = days[len(days) // 2]
+        start_iso = f"{mid_day}T04:00:00"
+        end_iso = (datetime.fromisoformat(start_iso) + timedelta(days=1)).isoformat()
+
+        def run(fn):
+            def call():
+                with db as d:
+                    return fn(d)
+            return call
+
+        cases = [
+            ("get_uncleaned_logs(limit=50)", run(lambda d: d.get_uncleaned_logs(limit=50))),
+            ("get_uncleaned_logs_for_day", run(lambda d: d.get_uncleaned_logs_for_day(mid_day))),
+            ("get_uncleaned_logs_between (1 day)", run(lambda d: d.get_uncleaned_logs_between(start_iso, end_iso))),
+            ("iter_uncleaned_days(after_id=last 1%)",
+             run(lambda d: list(d.iter_uncleaned_days(after_id=int(max_id * 0.99))))),
+            ("get_cleaned_logs(goal_id=2)", run(lambda d: d.get_cleaned_logs(2))),
+            ("get_latest_cleaned_day", run(lambda d: d.get_latest_cleaned_day())),
+            ("get_change_markers", run(lambda d: d.get_change_markers())),
+            ("SummaryIndex.search (k=8)", lambda: index.search("guitar practice tired evening", k=8)),
+        ]
+        for name, fn in cases:
+            result = measure(f"{name} @{size}", fn, iterations)
+            result["rows"] = size
+            results.append(result)
+
+        # the same day window once its day has moved to the cold archive
+        t0 = time.perf_counter()
+        archived_days, _ = db.archive_days((datetime.fromisoformat(start_iso) + timedelta(days=2)).date().isoformat())
+        print(f"  (archived {archived_days} days in {time.perf_counter() - t0:.1f}s)")
+        result = measure(f"get_uncleaned_logs_between (archived day) @{size}",
+                         run(lambda d: d.get_uncleaned_logs_between(start_iso, end_iso)), iterations)
+        result["rows"] = size
+        results.append(result)
+        db.close()
+    return results
+
+
+def bench_generate_reply(workdir: str, history: int, turns: int, latency: float) -> List[Dict[str, Any]]:
+    path = os.path.join(workdir, "reply.db")
+    make_history(path, history)
+    print(f"\n[generate_reply] {history} messages of history, fake model latency {latency * 1000:.0f} ms")
+    backend = FakeBackend(latency=latency)
+    ai = AccountabilityAI(path, backend=backend, backfill_on_start=False)
+    rng = random.Random(3)
+
+    results = [
+        measure("generate_reply", lambda: ai.generate_reply(_sentence(rng, 15)), turns),
+        measure("generate_reply_stream (drained)", lambda: "".join(ai.generate_reply_stream(_sentence(rng, 15))), turns),
+        measure("prompt assembly only (context.build)", lambda: ai.context.build(ai.messages), turns),
+    ]
+    p50 = results[0]["p50_ms"] / 1000
+    print(f"  ~{1 / p50 if p50 else float('inf'):.0f} turns/sec single-threaded")
+    ai.db.close()
+    return results
+
+
+def bench_backfill(workdir: str, years: float, per_day: int, latency: float, workers: int, runs: int) -> List[Dict[str, Any]]:
+    template = os.path.join(workdir, "backfill_template.db")
+    n_messages = int(365 * years * 0.4 * per_day)
+    info = make_history(template, n_messages, years=years, with_cleaned=False)
+    print(f"\n[backfill] {info['messages']} messages, {info['active_days']} active days over {years} years, "
+          f"fake model latency {latency * 1000:.0f} ms, {workers} workers")
+
+    results = []
+    for label, batch_chars in (("per-day calls", 0), ("batched", 12000)):
+        samples = []
+        calls = 0
+        for i in range(runs):
+            path = os.path.join(workdir, f"backfill_{batch_chars}_{i}.db")
+            copy_db(template, path)
+            backend = FakeBackend(latency=latency)
+            ai = AccountabilityAI(path, backend=backend, backfill_on_start=False)
+            t0 = time.perf_counter()
+            ai.backfill_cleaned_logs(max_workers=workers, batch_chars=batch_chars)
+            samples.append(time.perf_counter() - t0)
+            calls = backend.calls
+            ai.db.close()
+        samples.sort()
+        result = {
+            "name": f"backfill_cleaned_logs ({label})",
+            "iterations": runs,
+            "p50_ms": statistics.median(samples) * 1000,
+            "p99_ms": samples[-1] * 1000,
+            "mean_ms": statistics.fmean(samples) * 1000,
+            "model_calls": calls,
+            "days": info["active_days"],
+        }
+        print(f"  {result['name']:<48} p50 {result['p50_ms']:9.1f} ms   max {result['p99_ms']:9.1f} ms   "
+              f"{calls} model calls")
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", choices=["db", "reply", "backfill"], action="append",
+                        help="run only these suites (repeatable)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                        help="row counts for the DB query suite")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.0, help="fake model latency in seconds")
+    parser.add_argument("--workers", type=int, default=4, help="backfill concurrency")
+    parser.add_argument("--years", type=float, default=3.0, help="history length for the backfill suite")
+    parser.add_argument("--quick", action="store_true", help="10k rows, fewer iterations")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    if args.quick:
+        args.sizes = [10_000]
+        args.iterations = min(args.iterations, 30)
+        args.years = min(args.years, 1.0)
+    suites = set(args.only or ["db", "reply", "backfill"])
+
+    workdir = tempfile.mkdtemp(prefix="localmind-bench-")
+    results: Dict[str, List[Dict[str, Any]]] = {}
+    try:
+        if "db" in suites:
+            results["db"] = bench_db(workdir, args.sizes, args.iterations)
+        if "reply" in suites:
+            results["reply"] = bench_generate_reply(workdir, history=min(args.sizes), turns=args.iterations,
+                                                    latency=args.latency)
+        if "backfill" in suites:
+            results["backfill"] = bench_backfill(workdir, years=args.years, per_day=6, latency=args.latency,
+                                                 workers=args.workers, runs=1 if args.quick else 3)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nresults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
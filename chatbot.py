@@ -1,35 +1,59 @@
-from database import Database
-import os
-from dotenv import load_dotenv
-import google.generativeai as genai
+from database import Database, logical_day
+from backfill import BackfillJob
+from context import ContextBuilder, estimate_tokens
+from history import ConversationHistory
+from compaction import RollingSummary
+from archive import DEFAULT_RETENTION_DAYS, archive_cutoff_day
+from retrieval import SummaryIndex
+from llm_cache import ResponseCache
+from backends import ModelBackend, backend_from_env
+from tracing import tracer
+import threading
+import time as _time
 from datetime import datetime, date, time, timedelta
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, Tuple, Callable
 import json
 
 # Remove timestamps from here, fill them in the DB directly when adding messages
 # Add AI prompt to iterate on goal so that GOAL is SMART.
-# stop backfilling at startup, trigger on close of chat?
 # option to delete goals
 # 
 
+# appended to an assistant reply that was stored before the stream finished
+INTERRUPTED_MARKER = " [reply interrupted]"
+
 class AccountabilityAI:
-    def __init__(self, db_path: str = "accountability.db"):
+    def __init__(self, db_path: str = "accountability.db", backend: Optional[ModelBackend] = None,
+                 backfill_on_start: bool = False):
         """
-        Initialize the accountability coach with API configuration and loads user's goals and conversation history.
+        Initialize the accountability coach. Construction only opens the database; the model client
+        (and its SDK import) is created on first model use and conversation history is loaded on first chat.
+        backend defaults to the one named by MODEL_BACKEND (Gemini unless set to "fake"; see backends.py).
+        Backfill runs when a chat is closed or the user goes idle, or right away with backfill_on_start.
         """
-        load_dotenv()
-        api_key = os.getenv('GEMINI_API_KEY')
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY not found in environment variables")
-        
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
-        self.db = Database(db_path)
-
-        with self.db as db:
-            recent = db.get_uncleaned_logs(limit=50)
-            self.messages: List[Dict[str, Any]] = recent[:]
-            self.goals = db.get_goals()
+        self._backend = backend
+        self._backend_lock = threading.Lock()
+        self._messages: Optional[ConversationHistory] = None
+        # messages kept in memory; older ones are read back from logs_uncleaned on demand
+        self.history_capacity = 100
+        # start backfill after this many seconds sitting at the chat prompt
+        self.idle_backfill_seconds = 60
+        # one long-lived WAL connection instead of a connect/close per `with` block
+        # (a few connections so background backfill workers don't queue behind the chat);
+        # chat messages are written behind the reply by a background writer instead of on each turn
+        self.db = Database(db_path, persistent=True, pool_size=4, durability="batched")
+        # raw messages of summarized days older than this move to the compressed archive after backfill
+        # (None keeps everything in logs_uncleaned)
+        self.archive_retention_days: Optional[float] = DEFAULT_RETENTION_DAYS
+        self.backfill_job: Optional[BackfillJob] = None
+        # repeat prompts (e.g. re-summarizing an unchanged day) are answered from disk
+        self.response_cache = ResponseCache(self.db)
+        # rendered goals/summaries are cached between turns and trimmed to a prompt budget;
+        # only the summaries relevant to the current message (plus the latest few) go in
+        self.summary_index = SummaryIndex(self.db)
+        self.context = ContextBuilder(self.db, index=self.summary_index)
+        # older turns get folded into a persisted running summary so the prompt only carries a short raw window
+        self.compactor = RollingSummary(self.db, lambda prompt: self.call_ai_model(prompt, use_cache=False))
 
         self.system_prompt = """
         You are AccountabilityAI — a data-driven productivity coach and advisor.
@@ -55,86 +79,232 @@ class AccountabilityAI:
         Supportive, but not indulgent — you challenge the user when they avoid responsibility.
         Conversational and personal, but concise — avoid long essays unless diagnosing a deeper pattern.
         """
-        self.backfill_cleaned_logs(cutoff_hour=4)
+        if backfill_on_start:
+            self.start_backfill(cutoff_hour=4)
+
+    @property
+    def backend(self) -> ModelBackend:
+        """The model backend, created (and its SDK imported) on first use."""
+        if self._backend is None:
+            with self._backend_lock:
+                if self._backend is None:
+                    self._backend = backend_from_env()
+        return self._backend
+
+    @property
+    def model_name(self) -> str:
+        return self.backend.name
+
+    @property
+    def messages(self) -> ConversationHistory:
+        """Recent conversation (bounded ring buffer), loaded from the DB the first time it's needed."""
+        if self._messages is None:
+            with self.db as db:
+                rows = db.get_uncleaned_logs(limit=self.history_capacity)
+            self._messages = ConversationHistory.from_dicts(rows, self.history_capacity, loader=self._load_older)
+        return self._messages
+
+    def _load_older(self, before_iso: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        with self.db as db:
+            return db.get_uncleaned_logs_before(before_iso, limit)
+
+    @property
+    def goals(self) -> List[Dict[str, Any]]:
+        with self.db as db:
+            return db.get_goals()
 
-    def call_ai_model(self, prompt: str) -> str:
+    def call_ai_model(self, prompt: str, use_cache: bool = True,
+                      throttle: Optional[Callable[[], None]] = None) -> str:
         """
-        Generate response using Gemini AI model with the given prompt.
+        Generate response from the model backend with the given prompt.
+        Responses are cached by (model, prompt); pass use_cache=False for calls that
+        should always hit the model, like chat replies.
+        throttle (e.g. a RateLimiter's wait) is called right before the backend, so cache hits don't wait.
         """
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            raise Exception(f"Error generating response: {str(e)}")
+        if use_cache:
+            cached = self.response_cache.get(self.model_name, prompt)
+            if cached is not None:
+                return cached
+        if throttle is not None:
+            throttle()
+        tracer.count("model.calls")
+        with tracer.span("model.call", prompt_chars=len(prompt)) as span:
+            try:
+                text = self.backend.generate(prompt)
+            except Exception as e:
+                raise Exception(f"Error generating response: {str(e)}")
+            span.set(reply_chars=len(text))
+        if use_cache:
+            self.response_cache.put(self.model_name, prompt, text)
+        return text
 
     def _make_timestamp(self) -> str:
         """Generate current UTC timestamp for message tracking."""
         return datetime.utcnow().isoformat()
 
+    def call_ai_model_stream(self, prompt: str) -> Iterator[str]:
+        """
+        Streaming counterpart of call_ai_model: yields text chunks as the model produces them.
+        """
+        tracer.count("model.calls")
+        with tracer.span("model.stream", prompt_chars=len(prompt)) as span:
+            start = _time.perf_counter()
+            chars = 0
+            try:
+                for text in self.backend.generate_stream(prompt):
+                    if not chars:
+                        span.set(first_chunk_ms=round((_time.perf_counter() - start) * 1000, 3))
+                    chars += len(text)
+                    yield text
+            except Exception as e:
+                raise Exception(f"Error generating response: {str(e)}")
+            finally:
+                span.set(reply_chars=chars)
+
+    def _start_turn(self, user_message: str) -> str:
+        """
+        Persist the user's message and build the full prompt for the reply.
+        Shared by generate_reply and generate_reply_stream.
+        """
+        # load history before persisting, otherwise the first load already contains this message
+        history = self.messages
+        ts_user = self._make_timestamp()
+        with tracer.span("turn.persist_user"):
+            with self.db as db:
+                db.add_message("user", user_message, ts_user)
+
+        history.append("user", user_message, ts_user)
+
+        with tracer.span("turn.prompt_build") as span:
+            # Goals, progress history and recent conversation, trimmed to the context budget
+            sections = self.context.build(self.messages, summary=self.compactor.summary, since=self.compactor.through)
+            goals_text = sections["goals"]
+            cleaned_text = sections["cleaned"]
+            summary_text = sections["summary"]
+            convo_text = sections["conversation"]
+
+            prompt = (
+                f"{self.system_prompt}\n\n"
+                f"Context - Goals:\n{goals_text}\n"
+                f"Context - Cleaned Logs:\n{cleaned_text}\n"
+                + (f"Conversation So Far (summary):\n{summary_text}\n" if summary_text else "")
+                + f"Recent Conversation:\n{convo_text}\n\n"
+                "Assistant:"
+            )
+            span.set(prompt_chars=len(prompt), prompt_tokens=estimate_tokens(prompt))
+        return prompt
+
+    def _finish_turn(self, reply: str):
+        """Persist assistant reply with timestamp and append to memory."""
+        ts_ai = self._make_timestamp()
+        with tracer.span("turn.persist_reply"):
+            with self.db as db:
+                db.add_message("assistant", reply, ts_ai)
+
+        self.messages.append("assistant", reply, ts_ai)
+        # fold old turns into the running summary while the user reads the reply
+        self.compactor.maybe_compact(self.messages)
+
     def generate_reply(self, user_message: str) -> str:
         """
         Generate a coaching response considering user's goals, progress history, and recent conversations.
         Stores both user messages and AI responses for continuous progress tracking.
         """
-        ts_user = self._make_timestamp()
-        with self.db as db:
-            goals = db.get_goals()
-            cleaned_logs = db.get_cleaned_logs()
-            db.add_message("user", user_message, ts_user)
-
-        self.messages.append({"role": "user", "content": user_message, "timestamp": ts_user})
-
-        # Format goals and progress history for AI context
-        goals_text = ""
-        for g in goals:
-            goals_text += f"- {g['name']}: {g['description']}\n"
-
-        cleaned_text = ""
-        for c in cleaned_logs:
-            cleaned_text += f"- (goal_id={c['goal_id']}) {c['date']}: {c['summary']}\n"
-
-        convo_text = ""
-        for m in self.messages[-50:]:
-            convo_text += f"[{m.get('timestamp','')}] {m['role']}: {m['content']}\n"
-
-        full_prompt = (
-            f"{self.system_prompt}\n\n"
-            f"Context - Goals:\n{goals_text}\n"
-            f"Context - Cleaned Logs:\n{cleaned_text}\n"
-            f"Recent Conversation:\n{convo_text}\n\n"
-            "Assistant:"
-        )
+        with tracer.span("turn"):
+            full_prompt = self._start_turn(user_message)
 
-        # Call model
-        reply = self.call_ai_model(full_prompt)
+            # Call model
+            reply = self.call_ai_model(full_prompt, use_cache=False)
 
-        # Persist assistant reply with timestamp and append to memory
-        ts_ai = self._make_timestamp()
-        with self.db as db:
-            db.add_message("assistant", reply, ts_ai)
+            self._finish_turn(reply)
+        return reply
 
-        self.messages.append({"role": "assistant", "content": reply, "timestamp": ts_ai})
+    def generate_reply_stream(self, user_message: str) -> Iterator[str]:
+        """
+        Same as generate_reply but yields the reply in chunks as they arrive.
+        The whole reply is stored once the stream ends. If it is cut short (model error, Ctrl+C,
+        or the caller closing the generator) whatever arrived so far is stored with an
+        INTERRUPTED_MARKER so the conversation history stays consistent.
+        """
+        with tracer.span("turn", stream=True):
+            full_prompt = self._start_turn(user_message)
 
-        return reply
+            parts: List[str] = []
+            completed = False
+            try:
+                for chunk in self.call_ai_model_stream(full_prompt):
+                    parts.append(chunk)
+                    yield chunk
+                completed = True
+            finally:
+                reply = "".join(parts)
+                if not completed and reply:
+                    reply += INTERRUPTED_MARKER
+                if reply:
+                    self._finish_turn(reply)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        In-process view of the instrumentation: span latencies and counters (only collected while
+        tracing is enabled, see tracing.py), response cache counters and backfill progress.
+        """
+        stats = tracer.stats()
+        stats["cache"] = self.response_cache.stats()
+        stats["backfill"] = self.backfill_job.progress() if self.backfill_job else None
+        return stats
 
     def run_chat(self):
         """
-        Run the chat interface.
+        Run the chat interface. Replies are printed as they stream in.
+        Backfill kicks off in the background when the chat closes or the user sits idle at the prompt.
         """
-        print("💬 Accountability AI Chat (type 'quit' to exit)\n")
+        try:
+            self.backend  # fail fast on a missing API key before the user types anything
+        except Exception as e:
+            print(f"\nError: {str(e)}")
+            return
 
-        while True:
-            user_input = input("You: ")
-            if user_input.lower() in ["quit", "exit", "q"]:
-                break
+        self.messages  # load history now rather than on the first turn
+        print("💬 Accountability AI Chat (type 'quit' to exit)\n")
+        if self.backfill_job and self.backfill_job.running:
+            p = self.backfill_job.progress()
+            print(f"(summarizing past days in the background: {p['done']}/{p['total']} done)\n")
 
-            try:
-                reply = self.generate_reply(user_input)
-                print("AI:", reply)
-            except Exception as e:
-                print(f"\nError: {str(e)}")
-                print("Please try again in a moment.")
-                break
+        try:
+            while True:
+                idle = threading.Timer(self.idle_backfill_seconds, self.start_backfill)
+                idle.daemon = True
+                idle.start()
+                try:
+                    user_input = input("You: ")
+                finally:
+                    idle.cancel()
+                if user_input.lower() in ["quit", "exit", "q"]:
+                    break
+
+                stream = self.generate_reply_stream(user_input)
+                try:
+                    print("AI: ", end="", flush=True)
+                    for chunk in stream:
+                        print(chunk, end="", flush=True)
+                    print()
+                except KeyboardInterrupt:
+                    # stop this reply but keep the chat going; the partial text is saved on close
+                    stream.close()
+                    print("\n(reply interrupted)")
+                except Exception as e:
+                    print(f"\nError: {str(e)}")
+                    print("Please try again in a moment.")
+                    break
+        finally:
+            # make sure the session is on disk, then fold it into the cleaned logs
+            self.db.flush()
+            self.start_backfill()
+
+    def close(self):
+        """Write out any queued messages and release the database connections. Call after backfill has finished."""
+        self.compactor.wait()
+        self.db.close()
 
     def _day_start_from_timestamp(self, ts: str, cutoff_hour: int = 4) -> date:
         """
@@ -142,13 +312,8 @@ class AccountabilityAI:
         E.g., cutoff_hour=4 means day runs from 04:01 of day D -> 04:00 of day D+1.
         Returns the date D as a date() object.
         """
-        dt = datetime.fromisoformat(ts)
-        # If time is before or equal to cutoff_hour:00 (i.e., 04:00), attribute it to previous logical day
-        cutoff = time(hour=cutoff_hour, minute=0, second=0)
-        if dt.time() <= cutoff:
-            # belongs to previous day
-            return (dt.date() - timedelta(days=1))
-        return dt.date()
+        # same rule the DB uses to fill logs_uncleaned.day
+        return date.fromisoformat(logical_day(ts, cutoff_hour))
 
     def _day_window_iso(self, day_start: date, cutoff_hour: int = 4) -> (str, str):
         """
@@ -163,12 +328,14 @@ class AccountabilityAI:
         # Use ISO format (no timezone)
         return (start_dt.isoformat(), end_dt.isoformat())
 
-    def summarize_logs_for_day(self, logs: List[Dict[str, Any]], goals: List[Dict[str, Any]], day_start: date) -> List[Dict[str, Any]]:
+    def summarize_logs_for_day(self, logs: List[Dict[str, Any]], goals: List[Dict[str, Any]], day_start: date,
+                               throttle: Optional[Callable[[], None]] = None) -> List[Dict[str, Any]]:
         """
         Ask the LLM to summarize a day's raw logs into per-goal cleaned summaries.
         Returns a list of dicts: [{"goal_id": <id or None>, "summary": "<text>"}, ...]
         - For each goal in `goals`, the model should produce a short summary (or an empty string).
         - If the model can't return structured JSON, we fallback to a general summary with goal_id=None.
+        - If the model call itself fails the error is raised, so backfill records the day as failed and retries it later.
         """
         # Build a compact prompt: provide goals and the day's messages, ask for JSON output.
         goals_text = "\n".join([f"{g['id']}: {g['name']} - {g['description']}" for g in goals]) if goals else "[]"
@@ -185,13 +352,8 @@ class AccountabilityAI:
             "Include at least one object with goal_id === null for any general, non-goal-specific notes if appropriate."
         )
 
-        # Call LLM (use your existing wrapper)
-        try:
-            raw = self.call_ai_model(prompt)
-        except Exception as e:
-            # On failure, fallback to a single general summary
-            general = "Failed to generate structured summary: " + str(e)
-            return [{"goal_id": None, "summary": general}]
+        # Call LLM (use your existing wrapper); errors propagate so the day isn't marked as summarized
+        raw = self.call_ai_model(prompt, throttle=throttle)
 
         # Attempt to parse JSON from the model's output
         parsed = None
@@ -207,68 +369,209 @@ class AccountabilityAI:
             parsed = None
 
         if isinstance(parsed, list):
-            # normalize items
-            results = []
-            for item in parsed:
-                # accept keys 'goal_id' and 'summary' or fallbacks
-                gid = item.get("goal_id") if isinstance(item, dict) else None
-                summ = item.get("summary") if isinstance(item, dict) else str(item)
-                results.append({"goal_id": gid, "summary": summ})
-            return results
+            return self._normalize_summaries(parsed)
 
         # fallback: create a single general summary using raw as content
         return [{"goal_id": None, "summary": raw.strip()}]
 
-    def backfill_cleaned_logs(self, cutoff_hour: int = 4) -> List[Dict[str, Any]]:
+    def _normalize_summaries(self, parsed: List[Any]) -> List[Dict[str, Any]]:
+        """Turn the model's JSON array into [{"goal_id": ..., "summary": ...}, ...]."""
+        results = []
+        for item in parsed:
+            # accept keys 'goal_id' and 'summary' or fallbacks
+            gid = item.get("goal_id") if isinstance(item, dict) else None
+            summ = item.get("summary") if isinstance(item, dict) else str(item)
+            results.append({"goal_id": gid, "summary": summ or ""})
+        return results
+
+    def summarize_logs_for_days(self, days: List[tuple], goals: List[Dict[str, Any]],
+                                throttle: Optional[Callable[[], None]] = None) -> Dict[str, List[Dict[str, Any]]]:
         """
-        Backfill missing cleaned logs from the DB using lazy summarization.
-        Workflow:
-          - Determine earliest uncleaned log and latest cleaned day.
-          - Compute list of day_start dates to ensure are covered (for days that have logs).
-          - For each missing day, fetch raw logs between start/end; if logs exist, summarize and insert cleaned rows.
-          - If no logs exist for that day, optionally insert a 'no activity' cleaned row with goal_id=None (skip if you prefer).
-        Returns a list of inserted cleaned-log metadata.
+        Summarize several days in one model call.
+        days: [(day_iso, logs), ...]. Returns {day_iso: [{"goal_id": ..., "summary": ...}, ...]}.
+        The model is asked for a JSON object keyed by day; any day it leaves out or gets wrong
+        (or the whole batch, if the reply can't be parsed) is summarized on its own with summarize_logs_for_day.
+        If the model call itself fails the error is raised; there's no point asking again day by day.
+        throttle (e.g. a RateLimiter's wait) is called before every model call that misses the cache, fallbacks included.
         """
-        inserted = []
-        with self.db as db:
-            # earliest raw log timestamp (iso) and latest cleaned day (YYYY-MM-DD)
-            earliest_iso = db.get_earliest_uncleaned_timestamp()
-            latest_cleaned_day = db.get_latest_cleaned_day()  # string YYYY-MM-DD or None
+        if len(days) == 1:
+            day_iso, logs = days[0]
+            return {day_iso: self.summarize_logs_for_day(logs, goals, date.fromisoformat(day_iso), throttle)}
 
-            if not earliest_iso:
-                return inserted  # nothing to do
+        goals_text = "\n".join([f"{g['id']}: {g['name']} - {g['description']}" for g in goals]) if goals else "[]"
+        days_text = ""
+        for day_iso, logs in days:
+            days_text += f"=== {day_iso} ===\n"
+            days_text += "\n".join([f"[{l['timestamp']}] {l['role']}: {l['content']}" for l in logs]) + "\n\n"
 
-            # Compute start and end range
-            first_day = self._day_start_from_timestamp(earliest_iso, cutoff_hour=cutoff_hour)
-            if latest_cleaned_day:
-                start_day = datetime.fromisoformat(latest_cleaned_day).date() + timedelta(days=1)
+        prompt = (
+            f"You are a summarization assistant. Below are the raw conversation logs for {len(days)} separate days. "
+            f"For EACH day, given the user's goals, produce a JSON array of objects mapping goal_id -> concise summary "
+            f"for that goal's progress that day. If no progress for a goal, provide an empty string for summary. "
+            f"Only use a day's own logs for its summary.\n\n"
+            f"Goals (id: name - desc):\n{goals_text}\n\n"
+            f"Raw logs by day:\n{days_text}"
+            "Return EXACTLY one valid JSON object keyed by date, like: "
+            '{"2024-01-01": [{"goal_id": 1, "summary": "Did work on X"}, {"goal_id": null, "summary": "General notes..."}], '
+            '"2024-01-03": [{"goal_id": 1, "summary": ""}]}\n'
+            f"The keys must be exactly: {', '.join(d for d, _ in days)}."
+        )
+
+        raw = self.call_ai_model(prompt, throttle=throttle)
+        parsed = None
+        try:
+            start = raw.find("{")
+            end = raw.rfind("}") + 1
+            if start != -1 and end > start:
+                parsed = json.loads(raw[start:end])
+        except ValueError:
+            parsed = None
+
+        results = {}
+        for day_iso, logs in days:
+            items = parsed.get(day_iso) if isinstance(parsed, dict) else None
+            if isinstance(items, list) and items:
+                results[day_iso] = self._normalize_summaries(items)
             else:
-                start_day = first_day
-
-            now_iso = datetime.utcnow().isoformat()
-            last_day = self._day_start_from_timestamp(now_iso, cutoff_hour=cutoff_hour)
-
-            # Process each day within the database context
-            day = start_day
-            while day <= last_day:
-                start_iso, end_iso = self._day_window_iso(day, cutoff_hour=cutoff_hour)
-                logs = db.get_uncleaned_logs_between(start_iso, end_iso)
-                
-                if logs:
-                    goals = db.get_goals()
-                    summaries = self.summarize_logs_for_day(logs, goals, day)
-                    
-                    for s in summaries:
-                        gid = s.get("goal_id")
-                        summary_text = s.get("summary", "").strip()
-                        
-                        if summary_text == "":
-                            db.add_cleaned_log(gid, "(no progress noted)", date=day.isoformat())
-                            inserted.append({"day": day.isoformat(), "goal_id": gid, "summary": "(no progress noted)"})
-                        else:
-                            db.add_cleaned_log(gid, summary_text, date=day.isoformat())
-                            inserted.append({"day": day.isoformat(), "goal_id": gid, "summary": summary_text})
-                
-                day = day + timedelta(days=1)
+                # fall back to a dedicated call for this day
+                results[day_iso] = self.summarize_logs_for_day(logs, goals, date.fromisoformat(day_iso), throttle)
+        return results
+
+    def plan_backfill(self, cutoff_hour: int = 4):
+        """
+        Work out which days need (re-)summarizing.
+        Returns (plan, goals, through_id):
+          - plan is [(day_iso, logs, previous), ...] oldest first, one entry per day with messages past its
+            watermark. For a day that was never summarized, logs are all its messages and previous is None;
+            for a partially summarized day, logs are only the new messages and previous is its current cleaned rows.
+          - through_id is the highest message id the plan covers.
+        Only messages past the global summarized_through_id are scanned, in one grouped pass.
+        Everything is read in one go so no read transaction stays open across the model calls.
+        """
+        with self.db as db:
+            after_id = db.get_summarized_through_id()
+            new_by_day = list(db.iter_uncleaned_days(after_id=after_id, cutoff_hour=cutoff_hour))
+            if not new_by_day:
+                return [], [], after_id
+
+            watermarks = db.get_day_watermarks([day_iso for day_iso, _ in new_by_day])
+            plan = []
+            through_id = after_id
+            for day_iso, logs in new_by_day:
+                through_id = max(through_id, logs[-1]["id"])
+                mark = watermarks.get(day_iso)
+                if mark is None:
+                    # fresh day; it may also hold messages from before the global watermark
+                    if after_id and cutoff_hour == db.cutoff_hour:
+                        logs = db.get_uncleaned_logs_for_day(day_iso)
+                    plan.append((day_iso, logs, None))
+                    continue
+                new_logs = [l for l in logs if l["id"] > mark]
+                if new_logs:
+                    previous = db.get_cleaned_logs_for_day(day_iso)
+                    plan.append((day_iso, new_logs, previous))
+            goals = db.get_goals() if plan else []
+        return plan, goals, through_id
+
+    def update_day_summary(self, day_iso: str, previous: List[Dict[str, Any]], new_logs: List[Dict[str, Any]],
+                           goals: List[Dict[str, Any]], throttle: Optional[Callable[[], None]] = None) -> List[Dict[str, Any]]:
+        """
+        Fold messages that arrived after a day was summarized into its existing summaries.
+        Only the previous summaries and the new messages are sent, not the whole day.
+        Returns the full replacement list for the day, same shape as summarize_logs_for_day.
+        A failed model call raises (the day's watermark stays put); only an unparseable reply falls back.
+        """
+        goals_text = "\n".join([f"{g['id']}: {g['name']} - {g['description']}" for g in goals]) if goals else "[]"
+        previous_text = "\n".join([f"goal_id={p['goal_id']}: {p['summary']}" for p in previous]) or "(none)"
+        logs_text = "\n".join([f"[{l['timestamp']}] {l['role']}: {l['content']}" for l in new_logs])
+
+        prompt = (
+            f"You are a summarization assistant. The day {day_iso} was already summarized per goal, but more "
+            f"conversation happened afterwards. Update the summaries so they cover the whole day: keep what the "
+            f"existing summaries say and add the progress shown in the new logs.\n\n"
+            f"Goals (id: name - desc):\n{goals_text}\n\n"
+            f"Existing summaries:\n{previous_text}\n\n"
+            f"New logs:\n{logs_text}\n\n"
+            "Return EXACTLY valid JSON with the complete updated list like: "
+            '[{"goal_id": 1, "summary": "Did work on X"}, {"goal_id": 2, "summary": ""}, {"goal_id": null, "summary": "General notes..."}]'
+        )
 
+        raw = self.call_ai_model(prompt, throttle=throttle)
+        try:
+            start = raw.find("[")
+            end = raw.rfind("]") + 1
+            parsed = json.loads(raw[start:end]) if start != -1 and end > start else None
+        except ValueError:
+            parsed = None
+
+        if isinstance(parsed, list) and parsed:
+            return self._normalize_summaries(parsed)
+        # keep the old summaries and add the model's reply as a general note, like summarize_logs_for_day does
+        kept = [{"goal_id": p["goal_id"], "summary": p["summary"]} for p in previous]
+        return kept + [{"goal_id": None, "summary": raw.strip()}] if raw.strip() else kept
+
+    def store_day_summaries(self, day_iso: str, summaries: List[Dict[str, Any]],
+                            last_log_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Replace one day's cleaned logs with `summaries` in a single transaction, moving the day's
+        watermark to last_log_id (the highest message id the summaries cover) when given.
+        Returns the inserted cleaned-log metadata.
+        """
+        inserted = []
+        with self.db.transaction() as db:
+            db.delete_cleaned_logs_for_day(day_iso)
+            for s in summaries:
+                gid = s.get("goal_id")
+                summary_text = s.get("summary", "").strip()
+
+                if summary_text == "":
+                    db.add_cleaned_log(gid, "(no progress noted)", date=day_iso)
+                    inserted.append({"day": day_iso, "goal_id": gid, "summary": "(no progress noted)"})
+                else:
+                    db.add_cleaned_log(gid, summary_text, date=day_iso)
+                    inserted.append({"day": day_iso, "goal_id": gid, "summary": summary_text})
+            if last_log_id is not None:
+                db.set_day_watermark(day_iso, last_log_id)
         return inserted
+
+    def advance_summarized_through(self, log_id: int):
+        """Record that every message up to and including log_id is covered by a day watermark."""
+        with self.db.transaction() as db:
+            if log_id > db.get_summarized_through_id():
+                db.set_summarized_through_id(log_id)
+
+    def archive_old_logs(self) -> Tuple[int, int]:
+        """Move summarized days older than archive_retention_days to the cold archive. Returns (days, messages)."""
+        if self.archive_retention_days is None:
+            return 0, 0
+        return self.db.archive_days(archive_cutoff_day(self.archive_retention_days))
+
+    def start_backfill(self, cutoff_hour: int = 4, max_workers: int = 4, rate_per_sec: Optional[float] = 2.0,
+                       batch_chars: int = 12000, batch_days: int = 14) -> BackfillJob:
+        """
+        Kick off backfill on a background thread and return the job (see BackfillJob.progress()).
+        A job that is already running is returned as-is instead of starting a second one.
+        """
+        if self.backfill_job and self.backfill_job.running:
+            return self.backfill_job
+        self.backfill_job = BackfillJob(self, cutoff_hour=cutoff_hour, max_workers=max_workers,
+                                        rate_per_sec=rate_per_sec, batch_chars=batch_chars,
+                                        batch_days=batch_days).start()
+        return self.backfill_job
+
+    def backfill_cleaned_logs(self, cutoff_hour: int = 4, max_workers: int = 1, rate_per_sec: Optional[float] = None,
+                              batch_chars: int = 12000, batch_days: int = 14) -> List[Dict[str, Any]]:
+        """
+        Backfill missing cleaned logs from the DB using lazy summarization, blocking until done.
+        Workflow:
+          - plan_backfill() streams messages past the summarized watermark in one grouped pass and loads goals once.
+          - Fresh days are packed into batches (up to batch_chars of logs / batch_days days; batch_chars=0 means one
+            day per call), each batch is one model call (up to max_workers at a time).
+          - Days that were already summarized but got more messages send only the new messages plus the old
+            summary (update_day_summary).
+          - Each day's cleaned rows are replaced, and its watermark moved, in one transaction.
+        Days without any new messages are skipped entirely.
+        Returns a list of inserted cleaned-log metadata.
+        """
+        return BackfillJob(self, cutoff_hour=cutoff_hour, max_workers=max_workers, rate_per_sec=rate_per_sec,
+                           batch_chars=batch_chars, batch_days=batch_days).run()
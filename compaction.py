@@ -0,0 +1,133 @@
+import threading
+from typing import List, Optional, Callable, Iterable
+
+from tracing import tracer
+
+# meta keys the running summary is persisted under
+SUMMARY_KEY = "session_summary"
+THROUGH_KEY = "session_summary_through"
+
+
+class RollingSummary:
+    """
+    Running summary of the conversation, so the prompt can carry "summary + short recent window"
+    instead of dozens of full messages.
+
+    The window is every message newer than `through` (the timestamp of the last message folded in).
+    Once it grows past window_chars, the oldest messages (all but the newest keep_messages /
+    keep_chars) are folded into the summary with one model call, by default on a background thread
+    after the reply has been delivered. Summary and watermark are stored in the meta table, so they
+    survive restarts.
+    """
+    def __init__(self, db, summarize: Callable[[str], str], window_chars: int = 6000,
+                 keep_chars: int = 2000, keep_messages: int = 6, max_fold_chars: int = 12000,
+                 max_summary_words: int = 250):
+        self.db = db
+        self.summarize = summarize
+        self.window_chars = window_chars
+        self.keep_chars = keep_chars
+        self.keep_messages = keep_messages
+        self.max_fold_chars = max_fold_chars
+        self.max_summary_words = max_summary_words
+        self.error: Optional[Exception] = None
+        self._summary: Optional[str] = None
+        self._through: Optional[str] = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def _load(self):
+        if self._loaded:
+            return
+        with self.db as db:
+            summary = db.get_meta(SUMMARY_KEY)
+            through = db.get_meta(THROUGH_KEY)
+        with self._lock:
+            if not self._loaded:
+                self._summary, self._through, self._loaded = summary or "", through, True
+
+    @property
+    def summary(self) -> str:
+        self._load()
+        return self._summary
+
+    @property
+    def through(self) -> Optional[str]:
+        self._load()
+        return self._through
+
+    def window(self, messages: Iterable) -> List:
+        """Messages not yet folded into the summary, oldest first."""
+        through = self.through
+        out = []
+        for m in reversed(messages):
+            if through is not None and m.get("timestamp", "") <= through:
+                break
+            out.append(m)
+        out.reverse()
+        return out
+
+    def maybe_compact(self, messages: Iterable, background: bool = True) -> bool:
+        """Fold the oldest messages into the summary if the window is over budget. Returns True if a fold started."""
+        if self._thread is not None and self._thread.is_alive():
+            return False
+        window = self.window(messages)
+        if sum(len(m["content"]) for m in window) <= self.window_chars:
+            return False
+
+        # keep the newest messages raw, fold the oldest ones (up to max_fold_chars per call)
+        kept, kept_chars = 0, 0
+        for m in reversed(window):
+            if kept >= self.keep_messages and kept_chars + len(m["content"]) > self.keep_chars:
+                break
+            kept += 1
+            kept_chars += len(m["content"])
+        fold, fold_chars = [], 0
+        for m in window[:len(window) - kept]:
+            if fold and fold_chars + len(m["content"]) > self.max_fold_chars:
+                break
+            fold.append(m)
+            fold_chars += len(m["content"])
+        if not fold:
+            return False
+
+        if background:
+            self._thread = threading.Thread(target=self._compact_safely, args=(fold,), name="compaction", daemon=True)
+            self._thread.start()
+        else:
+            self.compact(fold)
+        return True
+
+    def wait(self):
+        if self._thread is not None:
+            self._thread.join()
+
+    def _compact_safely(self, fold: List):
+        try:
+            self.compact(fold)
+        except Exception as e:
+            # the window just stays long until the next attempt
+            self.error = e
+
+    def compact(self, fold: List):
+        """Fold `fold` (oldest first, all newer than `through`) into the summary and persist it."""
+        with tracer.span("compaction", messages=len(fold)) as span:
+            previous = self.summary
+            turns = "\n".join(f"[{m.get('timestamp', '')}] {m['role']}: {m['content']}" for m in fold)
+            prompt = (
+                "You maintain the running summary of an ongoing coaching conversation.\n"
+                f"Update the summary with the new turns below. Keep commitments, obstacles, decisions and "
+                f"anything the user asked to remember; drop small talk. Reply with the summary text only, "
+                f"at most {self.max_summary_words} words.\n\n"
+                f"Current summary:\n{previous or '(none yet)'}\n\n"
+                f"New turns:\n{turns}\n"
+            )
+            summary = self.summarize(prompt).strip()
+            through = fold[-1].get("timestamp", "")
+            with self.db.transaction() as db:
+                db.set_meta(SUMMARY_KEY, summary)
+                db.set_meta(THROUGH_KEY, through)
+            with self._lock:
+                self._summary, self._through = summary, through
+            span.set(summary_chars=len(summary))
+        tracer.count("compaction.folds")
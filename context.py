@@ -0,0 +1,171 @@
+from bisect import insort
+from typing import List, Dict, Any, Optional, Tuple
+
+# Rough chars-per-token ratio used to turn a token budget into a character budget.
+CHARS_PER_TOKEN = 4
+
+NO_PROGRESS = "(no progress noted)"
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN
+
+
+class ContextBuilder:
+    """
+    Keeps the goal and cleaned-log sections of the prompt rendered in memory and only pulls rows
+    that changed since the last turn, then trims everything to a character budget.
+
+    Priority when the budget is tight:
+      - goals: ones with recent progress before stale ones (capped at goal_share of the budget)
+      - conversation: newest messages first (capped at convo_share of the budget)
+      - cleaned logs: with an index, the top_k summaries most relevant to the query first,
+        then the newest ones; without one, newest first. Uses whatever budget is left.
+    """
+    def __init__(self, db, max_chars: Optional[int] = None, max_tokens: int = 6000,
+                 goal_share: float = 0.25, convo_share: float = 0.5, max_messages: int = 50,
+                 index=None, top_k: int = 8, recent_k: int = 5):
+        self.db = db
+        self.index = index
+        self.top_k = top_k
+        self.recent_k = recent_k
+        self.max_chars = max_chars if max_chars is not None else max_tokens * CHARS_PER_TOKEN
+        self.goal_share = goal_share
+        self.convo_share = convo_share
+        self.max_messages = max_messages
+
+        self._goal_marker: Optional[Tuple[int, int]] = None
+        self._cleaned_marker: Optional[Tuple[int, int]] = None
+        self._goal_lines: Dict[int, str] = {}
+        # (date, id, line) kept sorted so the newest summaries are at the end
+        self._cleaned: List[Tuple[str, int, str]] = []
+        self._cleaned_by_id: Dict[int, Tuple[str, int, str]] = {}
+        self._last_cleaned_id = 0
+        # goal_id -> latest date with real progress, used to rank goals
+        self._goal_activity: Dict[int, str] = {}
+
+    # ---- Cache maintenance ----
+    def refresh(self):
+        """Sync the cached segments with the database, doing work proportional to what changed."""
+        with self.db as db:
+            markers = db.get_change_markers()
+
+            if markers["goals"] != self._goal_marker:
+                # goals are few; re-render them all when anything changes
+                self._goal_lines = {
+                    g["id"]: f"- {g['name']}: {g['description']}\n" for g in db.get_goals()
+                }
+                self._goal_marker = markers["goals"]
+
+            if markers["logs_cleaned"] != self._cleaned_marker:
+                count, _ = markers["logs_cleaned"]
+                new_rows = db.get_cleaned_logs_after(self._last_cleaned_id)
+                if len(self._cleaned) + len(new_rows) != count:
+                    # rows were deleted or replaced (or raced with a writer), start over
+                    self._cleaned = []
+                    self._cleaned_by_id = {}
+                    self._goal_activity = {}
+                    self._last_cleaned_id = 0
+                    new_rows = db.get_cleaned_logs_after(0)
+                for c in new_rows:
+                    self._add_cleaned(c)
+                    self._last_cleaned_id = max(self._last_cleaned_id, c["id"])
+                # describe what we actually hold so a write that landed mid-refresh is picked up next time
+                self._cleaned_marker = (len(self._cleaned), self._last_cleaned_id)
+
+    def _add_cleaned(self, c: Dict[str, Any]):
+        line = f"- (goal_id={c['goal_id']}) {c['date']}: {c['summary']}\n"
+        entry = (c["date"] or "", c["id"], line)
+        insort(self._cleaned, entry)
+        self._cleaned_by_id[c["id"]] = entry
+        gid = c["goal_id"]
+        if gid is not None and c["summary"] != NO_PROGRESS and c["date"]:
+            if c["date"] > self._goal_activity.get(gid, ""):
+                self._goal_activity[gid] = c["date"]
+
+    # ---- Rendering ----
+    def build(self, messages: List[Dict[str, Any]], query: Optional[str] = None,
+              summary: str = "", since: Optional[str] = None) -> Dict[str, str]:
+        """
+        Return the prompt sections {"goals", "cleaned", "summary", "conversation"} for the given messages
+        (chronological, newest last; message dicts or a history.ConversationHistory), trimmed to the budget.
+        query picks the relevant summaries; it defaults to the latest message.
+        With a running conversation summary (see compaction.py), only messages newer than `since`
+        are rendered and the summary shares the conversation budget with them.
+        """
+        self.refresh()
+        remaining = self.max_chars
+
+        # goals, most recently active first
+        ranked = sorted(self._goal_lines, key=lambda gid: self._goal_activity.get(gid, ""), reverse=True)
+        goals_text, used = self._take([self._goal_lines[gid] for gid in ranked], int(self.max_chars * self.goal_share))
+        remaining -= used
+
+        # conversation, newest first then restored to chronological order
+        convo_lines = []
+        budget = min(remaining, int(self.max_chars * self.convo_share))
+        summary_text = ""
+        if summary:
+            summary_text = summary[:budget // 2].rstrip() + "\n"
+            budget -= len(summary_text)
+            remaining -= len(summary_text)
+        for i, m in enumerate(reversed(messages)):
+            if i >= self.max_messages:
+                break
+            if since is not None and m.get("timestamp", "") <= since:
+                break
+            line = f"[{m.get('timestamp','')}] {m['role']}: {m['content']}\n"
+            if len(line) > budget:
+                break
+            convo_lines.append(line)
+            budget -= len(line)
+        convo_lines.reverse()
+        convo_text = "".join(convo_lines)
+        remaining -= len(convo_text)
+
+        # cleaned logs with what's left
+        if self.index is None:
+            cleaned_text, _ = self._take((line for _, _, line in reversed(self._cleaned)), remaining)
+        else:
+            if query is None:
+                query = messages[-1]["content"] if messages else ""
+            # goal names steer retrieval towards summaries about the goals that are in play
+            query = query + " " + " ".join(self._goal_lines[gid] for gid in ranked[:3])
+            cleaned_text = self._relevant_cleaned(query, remaining)
+
+        return {"goals": goals_text, "cleaned": cleaned_text, "summary": summary_text, "conversation": convo_text}
+
+    def _relevant_cleaned(self, query: str, budget: int) -> str:
+        """Top-k relevant summaries, then the most recent ones, within budget; rendered newest first."""
+        candidates = []
+        seen = set()
+        for cleaned_id, _ in self.index.search(query, k=self.top_k):
+            entry = self._cleaned_by_id.get(cleaned_id)
+            if entry and cleaned_id not in seen:
+                candidates.append(entry)
+                seen.add(cleaned_id)
+        for entry in self._cleaned[-self.recent_k:][::-1] if self.recent_k else []:
+            if entry[1] not in seen:
+                candidates.append(entry)
+                seen.add(entry[1])
+
+        chosen = []
+        used = 0
+        for entry in candidates:
+            if used + len(entry[2]) > budget:
+                continue
+            chosen.append(entry)
+            used += len(entry[2])
+        chosen.sort(reverse=True)
+        return "".join(line for _, _, line in chosen)
+
+    def _take(self, lines, budget: int) -> Tuple[str, int]:
+        """Concatenate lines in order until the next one would exceed budget."""
+        out = []
+        used = 0
+        for line in lines:
+            if used + len(line) > budget:
+                break
+            out.append(line)
+            used += len(line)
+        return "".join(out), used
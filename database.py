@@ -1,59 +1,558 @@
 import sqlite3
-from datetime import datetime
+import atexit
+import heapq
+import os
+import queue
+import sys
+import time as _time
+import threading
+from itertools import groupby
+from contextlib import contextmanager
+from datetime import datetime, date, time, timedelta
 from typing import List, Dict, Optional
 from datetime import datetime
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Iterator, Tuple
+
+from retrieval import term_counts
+from archive import pack_logs, unpack_logs, DEFAULT_CODEC
+
+# Applied to every long-lived connection. WAL lets readers run alongside the writer and
+# synchronous=NORMAL only fsyncs at checkpoints instead of on every commit.
+PERSISTENT_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",
+    "PRAGMA busy_timeout=5000",
+)
+
+
+DEFAULT_CUTOFF_HOUR = 4
+
+
+def logical_day(ts: Optional[str], cutoff_hour: int = DEFAULT_CUTOFF_HOUR) -> Optional[str]:
+    """
+    Map an ISO timestamp to the YYYY-MM-DD of the logical day it belongs to.
+    Anything at or before cutoff_hour:00 counts towards the previous day (late nights stay with the day they started).
+    """
+    if not ts:
+        return None
+    try:
+        dt = datetime.fromisoformat(ts)
+    except ValueError:
+        return None
+    if dt.time() <= time(hour=cutoff_hour):
+        return (dt.date() - timedelta(days=1)).isoformat()
+    return dt.date().isoformat()
+
+
+# ---- Schema migrations ----
+# Each entry upgrades the schema by one version (tracked in PRAGMA user_version).
+# Append new migrations to the end; never edit one that has already shipped.
+
+def _migration_base_tables(conn: sqlite3.Connection):
+    """v1: original tables. Uses IF NOT EXISTS so databases created before versioning pass straight through."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS goals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS logs_uncleaned (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            role TEXT CHECK(role IN ('user','assistant')) DEFAULT 'user',
+            message TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS logs_cleaned (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            goal_id INTEGER,
+            summary TEXT NOT NULL,
+            date DATE DEFAULT CURRENT_DATE,
+            FOREIGN KEY (goal_id) REFERENCES goals (id)
+        )
+    """)
+
+
+def _migration_logical_day_and_indexes(conn: sqlite3.Connection):
+    """v2: stored logical day on raw logs (backfilled) plus indexes for day windows and per-goal history."""
+    conn.execute("ALTER TABLE logs_uncleaned ADD COLUMN day TEXT")
+    conn.execute("UPDATE logs_uncleaned SET day = logical_day(created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_uncleaned_day ON logs_uncleaned (day, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_uncleaned_created_at ON logs_uncleaned (created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_cleaned_goal_date ON logs_cleaned (goal_id, date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_cleaned_date ON logs_cleaned (date)")
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('cutoff_hour', logical_day_cutoff())")
+
+
+def _migration_summary_index(conn: sqlite3.Connection):
+    """v3: BM25 inverted index over logs_cleaned.summary, built here for existing rows."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS summary_postings (
+            term TEXT NOT NULL,
+            cleaned_id INTEGER NOT NULL,
+            tf INTEGER NOT NULL,
+            PRIMARY KEY (term, cleaned_id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_summary_postings_cleaned ON summary_postings (cleaned_id)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS summary_docs (
+            cleaned_id INTEGER PRIMARY KEY,
+            length INTEGER NOT NULL
+        )
+    """)
+    for cleaned_id, summary in conn.execute("SELECT id, summary FROM logs_cleaned").fetchall():
+        _index_summary(conn, cleaned_id, summary)
+
+
+def _index_summary(conn: sqlite3.Connection, cleaned_id: int, summary: str):
+    counts, length = term_counts(summary)
+    conn.execute("INSERT OR REPLACE INTO summary_docs (cleaned_id, length) VALUES (?, ?)", (cleaned_id, length))
+    conn.executemany(
+        "INSERT OR REPLACE INTO summary_postings (term, cleaned_id, tf) VALUES (?, ?, ?)",
+        [(term, cleaned_id, tf) for term, tf in counts.items()]
+    )
+
+
+def _migration_llm_cache(conn: sqlite3.Connection):
+    """v4: content-addressed model response cache (see llm_cache.ResponseCache)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            key TEXT PRIMARY KEY,
+            model TEXT NOT NULL,
+            response TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            last_used REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache (last_used)")
+
+
+def _migration_day_watermarks(conn: sqlite3.Connection):
+    """
+    v5: per-day watermark = highest logs_uncleaned.id folded into that day's cleaned logs,
+    plus a global summarized_through_id below which every message is covered.
+    Days that already have cleaned logs are assumed fully covered, matching the old "latest cleaned day" rule.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS day_watermarks (
+            day TEXT PRIMARY KEY,
+            last_log_id INTEGER NOT NULL
+        )
+    """)
+    conn.execute("""
+        INSERT OR REPLACE INTO day_watermarks (day, last_log_id)
+        SELECT day, MAX(id) FROM logs_uncleaned
+        WHERE day IN (SELECT DISTINCT date FROM logs_cleaned)
+        GROUP BY day
+    """)
+    conn.execute("""
+        INSERT OR REPLACE INTO meta (key, value)
+        SELECT 'summarized_through_id', COALESCE(MAX(id), 0) FROM logs_uncleaned
+        WHERE day <= COALESCE(
+            (SELECT value FROM meta WHERE key = 'backfilled_through'),
+            (SELECT MAX(date) FROM logs_cleaned),
+            ''
+        )
+    """)
+    conn.execute("DELETE FROM meta WHERE key = 'backfilled_through'")
+
+
+def _migration_log_archive(conn: sqlite3.Connection):
+    """v6: cold store for raw logs of summarized days, one compressed blob per logical day (see archive.py)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS logs_archive (
+            day TEXT PRIMARY KEY,
+            first_id INTEGER NOT NULL,
+            last_id INTEGER NOT NULL,
+            first_at TEXT NOT NULL,
+            last_at TEXT NOT NULL,
+            message_count INTEGER NOT NULL,
+            codec TEXT NOT NULL,
+            payload BLOB NOT NULL
+        )
+    """)
+
+
+MIGRATIONS = [
+    _migration_base_tables,
+    _migration_logical_day_and_indexes,
+    _migration_summary_index,
+    _migration_llm_cache,
+    _migration_day_watermarks,
+    _migration_log_archive,
+]
+
+
+class ConnectionPool:
+    """
+    Small pool of long-lived SQLite connections.
+    Connections are opened lazily (up to `size`) and handed back out LIFO so a single-threaded
+    caller keeps reusing the same warm connection and its statement cache.
+    """
+    def __init__(self, db_path: str, size: int = 1, timeout: float = 30.0, cached_statements: int = 256):
+        self.db_path = db_path
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self._idle = queue.LifoQueue()
+        self._all: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in PERSISTENT_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._all) < self.size:
+                conn = self._connect()
+                self._all.append(conn)
+                return conn
+        # pool exhausted, wait for another thread to hand one back
+        return self._idle.get(timeout=self.timeout)
+
+    def release(self, conn: sqlite3.Connection):
+        self._idle.put(conn)
+
+    def close(self):
+        with self._lock:
+            for conn in self._all:
+                conn.close()
+            self._all = []
+            self._idle = queue.LifoQueue()
 
 
+_INSERT_MESSAGE = "INSERT INTO logs_uncleaned (role, message, created_at, day) VALUES (?, ?, ?, ?)"
+_STOP = object()
+_FLUSH = object()
+
+
+class WriteBehindError(RuntimeError):
+    """Raised by flush() for queued rows the writer couldn't store; they are in `rows`."""
+    def __init__(self, rows: List[tuple], error: Exception):
+        super().__init__(f"{len(rows)} queued messages could not be written: {error}")
+        self.rows = rows
+        self.error = error
+
+
+class WriteBehindQueue:
+    """
+    Background writer for logs_uncleaned rows. Rows are queued by Database.add_message and written
+    by one thread with executemany in a single transaction, once flush_size rows are waiting or
+    flush_interval seconds after the first one arrived, whichever comes first.
+    flush() wakes the writer and blocks until everything queued so far is on disk.
+    If a batch fails it is written again row by row, so only the rows that really can't be stored
+    (e.g. ones failing a CHECK) are lost; flush() raises a WriteBehindError carrying them.
+    """
+    def __init__(self, db: "Database", flush_size: int = 64, flush_interval: float = 0.2):
+        self.db = db
+        self.flush_size = max(1, flush_size)
+        self.flush_interval = flush_interval
+        self.error: Optional[Exception] = None
+        # rows that failed on their own, handed to the caller by the next flush()
+        self.failed: List[tuple] = []
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # the writer keeps its own connection so it never waits on the pool the readers are using
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def put(self, row: tuple):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                    self._thread.start()
+        self._queue.put(row)
+
+    def pending(self) -> bool:
+        return self._queue.unfinished_tasks > 0
+
+    def flush(self, raise_errors: bool = True):
+        """Write everything queued so far now and wait for it. Raises WriteBehindError for rows that failed."""
+        if self._thread is not None and self.pending():
+            self._queue.put(_FLUSH)  # cuts the writer's flush_interval wait short
+        self._queue.join()
+        if raise_errors:
+            with self._lock:
+                failed, error = self.failed, self.error
+                self.failed, self.error = [], None
+            if failed:
+                raise WriteBehindError(failed, error)
+
+    def close(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _FLUSH:
+                self._queue.task_done()
+                continue
+            if first is _STOP:
+                self._close_conn()
+                self._queue.task_done()
+                return
+            batch = [first]
+            markers = 0
+            stop = False
+            deadline = _time.monotonic() + self.flush_interval
+            while len(batch) < self.flush_size:
+                remaining = deadline - _time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    row = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if row is _FLUSH:
+                    markers += 1
+                    break
+                if row is _STOP:
+                    stop = True
+                    break
+                batch.append(row)
+
+            self._write(batch)
+            for _ in range(len(batch) + markers):
+                self._queue.task_done()
+            if stop:
+                self._close_conn()
+                self._queue.task_done()
+                return
+
+    def _close_conn(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _write(self, batch: List[tuple]):
+        for attempt in range(3):
+            try:
+                if self._conn is None:
+                    self._conn = self.db._connect_writer()
+                with self._conn:
+                    self._conn.executemany(_INSERT_MESSAGE, batch)
+                return
+            except sqlite3.IntegrityError:
+                break  # a bad row; retrying the whole batch won't help
+            except Exception:
+                # busy / locked database and the like, worth another go
+                _time.sleep(0.1 * (attempt + 1))
+        self._write_rows(batch)
+
+    def _write_rows(self, batch: List[tuple]):
+        """Fallback for a failed batch: one INSERT per row in one transaction, keeping every row that works."""
+        failed = []
+        try:
+            if self._conn is None:
+                self._conn = self.db._connect_writer()
+            with self._conn:
+                for row in batch:
+                    try:
+                        self._conn.execute(_INSERT_MESSAGE, row)
+                    except sqlite3.DatabaseError as e:
+                        failed.append((row, e))
+        except Exception as e:
+            failed = [(row, e) for row in batch]
+        if failed:
+            with self._lock:
+                self.failed.extend(row for row, _ in failed)
+                self.error = failed[-1][1]
+            print(f"[database] could not write {len(failed)} of {len(batch)} messages: {failed[-1][1]}", file=sys.stderr)
+
 
 class Database:
-    def __init__(self, db_path="accountability.db"):
+    def __init__(self, db_path="accountability.db", persistent: bool = False, pool_size: int = 1,
+                 cutoff_hour: int = DEFAULT_CUTOFF_HOUR, durability: str = "immediate",
+                 flush_size: int = 64, flush_interval: float = 0.2):
+        """
+        persistent=False keeps the original behaviour: every `with db:` block opens and closes its own connection.
+        persistent=True keeps up to `pool_size` connections open (WAL, tuned pragmas, cached statements)
+        and `with db:` borrows one for the duration of the block.
+        cutoff_hour decides which logical day a message is stored under (see logical_day).
+        durability="immediate" writes add_message rows in the caller's transaction; "batched" hands them to a
+        WriteBehindQueue (flush_size / flush_interval) so the caller doesn't wait on the write. Batched rows
+        are flushed before any logs_uncleaned read, on flush()/close(), and at interpreter exit.
+        """
+        if durability not in ("immediate", "batched"):
+            raise ValueError(f"unknown durability {durability!r}, expected 'immediate' or 'batched'")
         self.db_path = db_path
-        self.conn = None
+        self.cutoff_hour = cutoff_hour
+        self.durability = durability
+        self.pool = ConnectionPool(db_path, size=pool_size) if persistent else None
+        # connection + nesting depth are tracked per thread so pooled callers don't share a cursor
+        self._local = threading.local()
         self._init_db()
+        self.writer: Optional[WriteBehindQueue] = None
+        if durability == "batched":
+            self.writer = WriteBehindQueue(self, flush_size=flush_size, flush_interval=flush_interval)
+            atexit.register(self.flush)
 
     def _init_db(self):
-        """Create tables if they don't exist (keeps original tables but add role/timestamp to logs)."""
-        with sqlite3.connect(self.db_path) as conn:
-            cur = conn.cursor()
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS goals (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    description TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS logs_uncleaned (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    role TEXT CHECK(role IN ('user','assistant')) DEFAULT 'user',
-                    message TEXT NOT NULL,
-                    created_at TEXT NOT NULL
-                )
-            """)
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS logs_cleaned (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    goal_id INTEGER,
-                    summary TEXT NOT NULL,
-                    date DATE DEFAULT CURRENT_DATE,
-                    FOREIGN KEY (goal_id) REFERENCES goals (id)
-                )
-            """)
-            conn.commit()
+        """Bring the schema up to date by running any migrations newer than the file's user_version."""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.create_function("logical_day", 1, lambda ts: logical_day(ts, self.cutoff_hour), deterministic=True)
+            conn.create_function("logical_day_cutoff", 0, lambda: str(self.cutoff_hour))
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for target in range(version + 1, len(MIGRATIONS) + 1):
+                # one transaction per migration so a failure leaves the file at the last good version
+                conn.execute("BEGIN")
+                MIGRATIONS[target - 1](conn)
+                conn.execute(f"PRAGMA user_version = {target}")
+                conn.commit()
 
-    def __enter__(self):
-        self.conn = sqlite3.connect(self.db_path)
+            # a different cutoff than the one the stored days were computed with means they are all stale
+            row = conn.execute("SELECT value FROM meta WHERE key = 'cutoff_hour'").fetchone()
+            if row is None or row[0] != str(self.cutoff_hour):
+                conn.execute("BEGIN")
+                conn.execute("UPDATE logs_uncleaned SET day = logical_day(created_at)")
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('cutoff_hour', ?)", (str(self.cutoff_hour),))
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    @property
+    def conn(self) -> Optional[sqlite3.Connection]:
+        return getattr(self._local, "conn", None)
+
+    def _acquire(self) -> sqlite3.Connection:
+        if self.pool is not None:
+            return self.pool.acquire()
+        conn = sqlite3.connect(self.db_path)
         # Let us access columns by name
-        self.conn.row_factory = sqlite3.Row
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _connect_writer(self) -> sqlite3.Connection:
+        if self.pool is not None:
+            return self.pool._connect()
+        return sqlite3.connect(self.db_path)
+
+    def _release(self, conn: sqlite3.Connection):
+        if self.pool is not None:
+            self.pool.release(conn)
+        else:
+            conn.close()
+
+    def __enter__(self):
+        # Blocks can nest; only the outermost one acquires the connection and commits.
+        depth = getattr(self._local, "depth", 0)
+        if depth == 0:
+            self._local.conn = self._acquire()
+        self._local.depth = depth + 1
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
-        if self.conn:
-            self.conn.commit()
-            self.conn.close()
-            self.conn = None
+        self._local.depth -= 1
+        if self._local.depth > 0:
+            return
+        conn = self._local.conn
+        self._local.conn = None
+        try:
+            if exc_type is None:
+                conn.commit()
+            else:
+                conn.rollback()
+        finally:
+            self._release(conn)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Explicit unit of commit. At the top level this is the same as `with db:`;
+        nested inside another block it becomes a SAVEPOINT so it can roll back on its own.
+        """
+        with self:
+            depth = self._local.depth
+            if depth == 1:
+                yield self
+                return
+            name = f"sp_{depth}"
+            if not self.conn.in_transaction:
+                self.conn.execute("BEGIN")
+            self.conn.execute(f"SAVEPOINT {name}")
+            try:
+                yield self
+            except BaseException:
+                self.conn.execute(f"ROLLBACK TO {name}")
+                self.conn.execute(f"RELEASE {name}")
+                raise
+            self.conn.execute(f"RELEASE {name}")
+
+    def flush(self):
+        """Write out any batched messages now. No-op with durability="immediate". Raises WriteBehindError for rows that failed."""
+        if self.writer is not None:
+            self.writer.flush()
+
+    def _sync_writes(self):
+        # read-your-writes for logs_uncleaned; skipped inside a write transaction, where the
+        # writer thread would just wait on our lock
+        if self.writer is not None and self.writer.pending():
+            if self.conn is None or not self.conn.in_transaction:
+                # failed rows are reported by the next explicit flush()/close(), not by unrelated reads
+                self.writer.flush(raise_errors=False)
+
+    def close(self):
+        """Flush batched writes and close any pooled connections. Safe to call in non-persistent mode."""
+        try:
+            if self.writer is not None:
+                self.writer.close()
+                atexit.unregister(self.flush)
+                self.writer.flush()
+        finally:
+            if self.pool is not None:
+                self.pool.close()
+
+    # ---- Meta ----
+    def get_meta(self, key: str) -> Optional[str]:
+        cur = self.conn.cursor()
+        cur.execute("SELECT value FROM meta WHERE key = ?", (key,))
+        row = cur.fetchone()
+        return row["value"] if row else None
+
+    def set_meta(self, key: str, value: str):
+        cur = self.conn.cursor()
+        cur.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def get_change_markers(self) -> Dict[str, tuple]:
+        """
+        Cheap (row count, max id) pair per table that prompt caches compare against to see if anything changed.
+        """
+        cur = self.conn.cursor()
+        markers = {}
+        for table in ("goals", "logs_cleaned"):
+            cur.execute(f"SELECT COUNT(*), COALESCE(MAX(id), 0) FROM {table}")
+            markers[table] = tuple(cur.fetchone())
+        return markers
 
     # ---- Goals ----
     def add_goal(self, name: str, description: str):
@@ -77,60 +576,150 @@ class Database:
         """
         if timestamp is None:
             timestamp = datetime.utcnow().isoformat()
+        row = (role, message, timestamp, logical_day(timestamp, self.cutoff_hour))
+        if self.writer is not None:
+            self.writer.put(row)
+            return
         cur = self.conn.cursor()
-        cur.execute(
-            "INSERT INTO logs_uncleaned (role, message, created_at) VALUES (?, ?, ?)",
-            (role, message, timestamp)
-        )
+        cur.execute(_INSERT_MESSAGE, row)
 
     def get_uncleaned_logs(self, limit: int = 50) -> List[Dict[str, str]]:
         """
-        Returns most recent logs (both user & assistant) in chronological order.
+        Returns most recent logs (both user & assistant) in chronological order, archived days included.
         Each item: {"role": ..., "content": ..., "timestamp": ...}
         """
+        return self.get_uncleaned_logs_before(None, limit)
+
+    def get_uncleaned_logs_before(self, before_iso: Optional[str], limit: int = 50) -> List[Dict[str, str]]:
+        """
+        The `limit` logs created just before `before_iso` (the latest ones if None), in chronological order,
+        archived days included. Same row shape as get_uncleaned_logs; used to page older history back in.
+        """
+        if limit <= 0:
+            return []
+        self._sync_writes()
         cur = self.conn.cursor()
-        cur.execute(
-            "SELECT role, message, created_at FROM logs_uncleaned ORDER BY id DESC LIMIT ?",
-            (limit,)
-        )
-        rows = cur.fetchall()
-        # rows are newest->oldest, reverse to chronological (old->new)
-        messages = []
-        for r in reversed(rows):
-            messages.append({"role": r["role"], "content": r["message"], "timestamp": r["created_at"]})
-        return messages
+        if before_iso is None:
+            cur.execute("SELECT id, role, message, created_at FROM logs_uncleaned ORDER BY id DESC LIMIT ?", (limit,))
+        else:
+            cur.execute(
+                "SELECT id, role, message, created_at FROM logs_uncleaned WHERE created_at < ? ORDER BY id DESC LIMIT ?",
+                (before_iso, limit)
+            )
+        # min-heap of the `limit` newest rows seen so far; rows[0] is the current cut
+        rows = [(r["id"], r["role"], r["message"], r["created_at"]) for r in cur.fetchall()]
+        heapq.heapify(rows)
+
+        # archived days can hold newer messages than the oldest hot row we got (or make up a short page);
+        # walk them newest first, one blob at a time, and stop once a whole day falls below the cut
+        floor = rows[0][0] if len(rows) >= limit else 0
+        if before_iso is None:
+            cur.execute("SELECT last_id, codec, payload FROM logs_archive WHERE last_id > ? ORDER BY last_id DESC", (floor,))
+        else:
+            cur.execute(
+                "SELECT last_id, codec, payload FROM logs_archive WHERE last_id > ? AND first_at < ? ORDER BY last_id DESC",
+                (floor, before_iso)
+            )
+        for r in cur:
+            if len(rows) >= limit and r["last_id"] < rows[0][0]:
+                break
+            for a in unpack_logs(r["payload"], r["codec"]):
+                if before_iso is not None and a[3] >= before_iso:
+                    continue
+                if len(rows) < limit:
+                    heapq.heappush(rows, a)
+                elif a[0] > rows[0][0]:
+                    heapq.heapreplace(rows, a)
+        rows.sort()
+        return [{"role": role, "content": message, "timestamp": created_at} for _, role, message, created_at in rows]
 
     # ---- Cleaned logs ----
     def get_cleaned_logs(self, goal_id: int = None):
         cur = self.conn.cursor()
         if goal_id:
-            cur.execute("SELECT id, goal_id, summary, date FROM logs_cleaned WHERE goal_id = ?", (goal_id,))
+            cur.execute("SELECT id, goal_id, summary, date FROM logs_cleaned WHERE goal_id = ? ORDER BY date DESC", (goal_id,))
         else:
             cur.execute("SELECT id, goal_id, summary, date FROM logs_cleaned ORDER BY date DESC")
         rows = cur.fetchall()
         return [{"id": r["id"], "goal_id": r["goal_id"], "summary": r["summary"], "date": r["date"]} for r in rows]
     
+    def get_cleaned_logs_after(self, last_id: int) -> List[Dict[str, Any]]:
+        """Cleaned logs with id > last_id, in insertion order."""
+        cur = self.conn.cursor()
+        cur.execute("SELECT id, goal_id, summary, date FROM logs_cleaned WHERE id > ? ORDER BY id ASC", (last_id,))
+        rows = cur.fetchall()
+        return [{"id": r["id"], "goal_id": r["goal_id"], "summary": r["summary"], "date": r["date"]} for r in rows]
+
     def get_uncleaned_logs_between(self, start_iso: str, end_iso: str) -> List[Dict[str, Any]]:
         """
         Return uncleaned logs (conversation rows) between two ISO timestamps (inclusive start, exclusive end).
         Each row: {"role": ..., "content": ..., "timestamp": ...}
         """
+        self._sync_writes()
         cur = self.conn.cursor()
         cur.execute(
-            "SELECT role, message, created_at FROM logs_uncleaned WHERE created_at >= ? AND created_at < ? ORDER BY id ASC",
+            "SELECT id, role, message, created_at FROM logs_uncleaned WHERE created_at >= ? AND created_at < ? ORDER BY id ASC",
             (start_iso, end_iso)
         )
-        rows = cur.fetchall()
-        return [{"role": r["role"], "content": r["message"], "timestamp": r["created_at"]} for r in rows]
+        rows = [(r["id"], r["role"], r["message"], r["created_at"]) for r in cur.fetchall()]
+        archived = [r for r in self._archived_rows_between(start_iso, end_iso) if start_iso <= r[3] < end_iso]
+        if archived:
+            rows = sorted(archived + rows)
+        return [{"role": role, "content": message, "timestamp": created_at} for _, role, message, created_at in rows]
 
-    def get_earliest_uncleaned_timestamp(self) -> Optional[str]:
+    def get_uncleaned_logs_for_day(self, day: str) -> List[Dict[str, Any]]:
         """
-        Return the earliest created_at ISO timestamp in logs_uncleaned, or None if no logs.
+        Return uncleaned logs stored under the logical day `day` (YYYY-MM-DD), oldest first.
+        Served straight from the (day, id) index; same row shape as get_uncleaned_logs_between plus the row "id".
         """
+        self._sync_writes()
         cur = self.conn.cursor()
-        cur.execute("SELECT created_at FROM logs_uncleaned ORDER BY id ASC LIMIT 1")
-        row = cur.fetchone()
-        return row["created_at"] if row else None
+        cur.execute(
+            "SELECT id, role, message, created_at FROM logs_uncleaned WHERE day = ? ORDER BY id ASC",
+            (day,)
+        )
+        rows = [(r["id"], r["role"], r["message"], r["created_at"]) for r in cur.fetchall()]
+        cur.execute("SELECT codec, payload FROM logs_archive WHERE day = ?", (day,))
+        archived = cur.fetchone()
+        if archived:
+            rows = sorted(unpack_logs(archived["payload"], archived["codec"]) + rows)
+        return [{"id": i, "role": role, "content": message, "timestamp": created_at} for i, role, message, created_at in rows]
+
+    def iter_uncleaned_days(self, start_day: Optional[str] = None, end_day: Optional[str] = None,
+                            cutoff_hour: Optional[int] = None, after_id: int = 0) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+        """
+        Stream (day, logs) pairs for every logical day in [start_day, end_day] that has at least one message,
+        oldest day first, in a single pass over logs_uncleaned. Days without messages are never visited.
+        after_id restricts the pass to messages with a larger id (i.e. ones newer than a watermark).
+        Pass cutoff_hour only if it differs from the one this Database stores days with; rows are then
+        bucketed in Python from created_at instead of the stored day column.
+        Each log also carries its row "id".
+        """
+        self._sync_writes()
+        cur = self.conn.cursor()
+        if cutoff_hour is None or cutoff_hour == self.cutoff_hour:
+            # with a watermark, walk the rowid range of new messages and sort just those;
+            # "+day" stops the planner from scanning the whole day index instead
+            day_col = "+day" if after_id else "day"
+            cur.execute(
+                "SELECT id, role, message, created_at, day FROM logs_uncleaned "
+                f"WHERE id > ? AND {day_col} >= ? AND {day_col} <= ? ORDER BY {day_col} ASC, id ASC",
+                (after_id, start_day or "", end_day or "9999-12-31")
+            )
+            day_of = lambda r: r["day"]
+        else:
+            # a message just before the cutoff on start_day still belongs to the previous day, so over-select and filter
+            start_iso = f"{start_day}T00:00:00" if start_day else ""
+            cur.execute(
+                "SELECT id, role, message, created_at FROM logs_uncleaned WHERE id > ? AND created_at >= ? ORDER BY id ASC",
+                (after_id, start_iso)
+            )
+            day_of = lambda r: logical_day(r["created_at"], cutoff_hour)
+
+        for day, rows in groupby(cur, key=day_of):
+            if day is None or (start_day and day < start_day) or (end_day and day > end_day):
+                continue
+            yield day, [{"id": r["id"], "role": r["role"], "content": r["message"], "timestamp": r["created_at"]} for r in rows]
 
     def get_latest_cleaned_day(self) -> Optional[str]:
         """
@@ -155,5 +744,200 @@ class Database:
             "INSERT INTO logs_cleaned (goal_id, summary, date) VALUES (?, ?, ?)",
             (goal_id, summary, date)
         )
-        self.conn.commit()
+        # keep the search index in step, inside the same transaction
+        _index_summary(self.conn, cur.lastrowid, summary)
         return cur.lastrowid
+
+    def get_cleaned_logs_for_day(self, day: str) -> List[Dict[str, Any]]:
+        cur = self.conn.cursor()
+        cur.execute("SELECT id, goal_id, summary, date FROM logs_cleaned WHERE date = ? ORDER BY id ASC", (day,))
+        rows = cur.fetchall()
+        return [{"id": r["id"], "goal_id": r["goal_id"], "summary": r["summary"], "date": r["date"]} for r in rows]
+
+    def delete_cleaned_logs_for_day(self, day: str) -> int:
+        """Remove a day's cleaned logs (and their search index entries). Returns the number removed."""
+        cur = self.conn.cursor()
+        cur.execute("SELECT id FROM logs_cleaned WHERE date = ?", (day,))
+        ids = [(r["id"],) for r in cur.fetchall()]
+        if not ids:
+            return 0
+        cur.executemany("DELETE FROM summary_postings WHERE cleaned_id = ?", ids)
+        cur.executemany("DELETE FROM summary_docs WHERE cleaned_id = ?", ids)
+        cur.executemany("DELETE FROM logs_cleaned WHERE id = ?", ids)
+        return len(ids)
+
+    # ---- Summarization watermarks ----
+    def get_day_watermarks(self, days: List[str]) -> Dict[str, int]:
+        """day -> highest logs_uncleaned.id already folded into that day's cleaned logs (missing = none)."""
+        if not days:
+            return {}
+        cur = self.conn.cursor()
+        placeholders = ",".join("?" * len(days))
+        cur.execute(f"SELECT day, last_log_id FROM day_watermarks WHERE day IN ({placeholders})", days)
+        return {r["day"]: r["last_log_id"] for r in cur.fetchall()}
+
+    def set_day_watermark(self, day: str, last_log_id: int):
+        cur = self.conn.cursor()
+        cur.execute("INSERT OR REPLACE INTO day_watermarks (day, last_log_id) VALUES (?, ?)", (day, last_log_id))
+
+    def get_summarized_through_id(self) -> int:
+        """Every message with id <= this is covered by some day's watermark."""
+        return int(self.get_meta("summarized_through_id") or 0)
+
+    def set_summarized_through_id(self, log_id: int):
+        self.set_meta("summarized_through_id", str(log_id))
+
+    # ---- Cold archive (see archive.py) ----
+    def _archived_rows_between(self, start_iso: str, end_iso: str) -> List[tuple]:
+        """Rows of every archived day that can overlap [start_iso, end_iso), unfiltered."""
+        start_day, end_day = logical_day(start_iso, self.cutoff_hour), logical_day(end_iso, self.cutoff_hour)
+        cur = self.conn.cursor()
+        if start_day and end_day:
+            # one day of slack each side in case the archive was written under a different cutoff_hour
+            start_day = (date.fromisoformat(start_day) - timedelta(days=1)).isoformat()
+            end_day = (date.fromisoformat(end_day) + timedelta(days=1)).isoformat()
+            cur.execute("SELECT codec, payload FROM logs_archive WHERE day >= ? AND day <= ?", (start_day, end_day))
+        else:
+            cur.execute("SELECT codec, payload FROM logs_archive WHERE first_at < ? AND last_at >= ?", (end_iso, start_iso))
+        rows = []
+        for r in cur.fetchall():
+            rows.extend(unpack_logs(r["payload"], r["codec"]))
+        return rows
+
+    def get_archivable_days(self, before_day: str) -> List[str]:
+        """Days before `before_day` whose raw messages are all folded into cleaned logs (per day watermark)."""
+        cur = self.conn.cursor()
+        cur.execute(
+            "SELECT l.day FROM logs_uncleaned l JOIN day_watermarks w ON w.day = l.day "
+            "WHERE l.day < ? GROUP BY l.day HAVING MAX(l.id) <= MAX(w.last_log_id) ORDER BY l.day",
+            (before_day,)
+        )
+        return [r["day"] for r in cur.fetchall()]
+
+    def archive_day(self, day: str, codec: str = DEFAULT_CODEC) -> int:
+        """
+        Move one day's raw messages into logs_archive (merging with anything already archived for it)
+        and delete them from logs_uncleaned. Run inside a transaction. Returns the number of messages moved.
+        """
+        cur = self.conn.cursor()
+        cur.execute("SELECT id, role, message, created_at FROM logs_uncleaned WHERE day = ? ORDER BY id ASC", (day,))
+        rows = [(r["id"], r["role"], r["message"], r["created_at"]) for r in cur.fetchall()]
+        if not rows:
+            return 0
+        cur.execute("SELECT codec, payload FROM logs_archive WHERE day = ?", (day,))
+        existing = cur.fetchone()
+        merged = sorted(unpack_logs(existing["payload"], existing["codec"]) + rows) if existing else rows
+        cur.execute(
+            "INSERT OR REPLACE INTO logs_archive (day, first_id, last_id, first_at, last_at, message_count, codec, payload) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (day, merged[0][0], merged[-1][0], min(r[3] for r in merged), max(r[3] for r in merged),
+             len(merged), codec, pack_logs(merged, codec))
+        )
+        cur.execute("DELETE FROM logs_uncleaned WHERE day = ? AND id <= ?", (day, rows[-1][0]))
+        return len(rows)
+
+    def archive_days(self, before_day: str, codec: str = DEFAULT_CODEC) -> Tuple[int, int]:
+        """
+        Archive every fully summarized day before `before_day`, one transaction per day so the
+        hot table is never locked for long. Returns (days archived, messages moved).
+        """
+        self._sync_writes()
+        with self:
+            days = self.get_archivable_days(before_day)
+        moved = 0
+        for day in days:
+            with self.transaction() as db:
+                moved += db.archive_day(day, codec)
+        return len(days), moved
+
+    def get_archive_stats(self) -> Dict[str, int]:
+        cur = self.conn.cursor()
+        cur.execute("SELECT COUNT(*), COALESCE(SUM(message_count), 0), COALESCE(SUM(LENGTH(payload)), 0) FROM logs_archive")
+        days, messages, size = cur.fetchone()
+        cur.execute("SELECT COUNT(*) FROM logs_uncleaned")
+        return {"archived_days": days, "archived_messages": messages, "archived_bytes": size,
+                "hot_messages": cur.fetchone()[0]}
+
+    def vacuum(self) -> Tuple[int, int]:
+        """
+        Give the space freed by archiving (or cache eviction) back to the filesystem: checkpoint the WAL,
+        VACUUM and refresh planner stats. Needs no other open transactions. Returns (bytes before, bytes after).
+        """
+        self.flush()
+        before = os.path.getsize(self.db_path)
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        try:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA optimize")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            conn.close()
+        return before, os.path.getsize(self.db_path)
+
+    # ---- Summary search index (see retrieval.SummaryIndex) ----
+    def get_summary_index_stats(self) -> Tuple[int, int]:
+        """(number of indexed summaries, total token length) for BM25."""
+        cur = self.conn.cursor()
+        cur.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM summary_docs")
+        n_docs, total_len = cur.fetchone()
+        return n_docs, total_len
+
+    def get_summary_postings(self, terms: List[str]) -> List[Tuple[str, int, int, int]]:
+        """(term, cleaned_id, tf, doc_length) for every indexed summary containing one of `terms`."""
+        if not terms:
+            return []
+        placeholders = ",".join("?" * len(terms))
+        cur = self.conn.cursor()
+        cur.execute(
+            "SELECT p.term, p.cleaned_id, p.tf, d.length FROM summary_postings p "
+            f"JOIN summary_docs d ON d.cleaned_id = p.cleaned_id WHERE p.term IN ({placeholders})",
+            terms
+        )
+        return [tuple(r) for r in cur.fetchall()]
+
+    # ---- Model response cache (see llm_cache.ResponseCache) ----
+    def get_cached_response(self, key: str, min_created_at: Optional[float] = None) -> Optional[str]:
+        cur = self.conn.cursor()
+        cur.execute(
+            "SELECT response FROM llm_cache WHERE key = ? AND created_at >= ?",
+            (key, min_created_at if min_created_at is not None else float("-inf"))
+        )
+        row = cur.fetchone()
+        return row["response"] if row else None
+
+    def touch_cached_response(self, key: str, now: float):
+        cur = self.conn.cursor()
+        cur.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+
+    def put_cached_response(self, key: str, model: str, response: str, now: float):
+        cur = self.conn.cursor()
+        cur.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, model, response, size, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, model, response, len(response.encode("utf-8")), now, now)
+        )
+
+    def evict_cached_responses(self, max_bytes: Optional[int] = None, min_created_at: Optional[float] = None) -> int:
+        """
+        Drop entries created before min_created_at, then least recently used entries until the
+        cache fits in max_bytes. Returns the number of rows removed.
+        """
+        cur = self.conn.cursor()
+        removed = 0
+        if min_created_at is not None:
+            cur.execute("DELETE FROM llm_cache WHERE created_at < ?", (min_created_at,))
+            removed += cur.rowcount
+        if max_bytes is not None:
+            cur.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache")
+            excess = cur.fetchone()[0] - max_bytes
+            if excess > 0:
+                victims = []
+                cur.execute("SELECT key, size FROM llm_cache ORDER BY last_used ASC")
+                for r in cur:
+                    if excess <= 0:
+                        break
+                    victims.append((r["key"],))
+                    excess -= r["size"]
+                cur.executemany("DELETE FROM llm_cache WHERE key = ?", victims)
+                removed += len(victims)
+        return removed
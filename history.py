@@ -0,0 +1,101 @@
+import sys
+from typing import List, Dict, Any, Optional, Iterator, Callable
+
+
+class Message:
+    """
+    One conversation turn. Slotted and with interned roles so a full history costs a few
+    small objects per message instead of a dict each. Supports m["role"] / m.get("timestamp")
+    so code written against the old message dicts keeps working.
+    """
+    __slots__ = ("role", "content", "timestamp")
+
+    def __init__(self, role: str, content: str, timestamp: str = ""):
+        self.role = sys.intern(role)
+        self.content = content
+        self.timestamp = timestamp
+
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default)
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"role": self.role, "content": self.content, "timestamp": self.timestamp}
+
+    def __repr__(self):
+        return f"Message({self.role!r}, {self.content[:30]!r}, {self.timestamp!r})"
+
+
+class ConversationHistory:
+    """
+    Fixed-capacity ring buffer of the most recent messages, oldest first.
+    Appending past capacity overwrites the oldest entry, so memory stays flat however long the
+    session runs. Everything appended is also in logs_uncleaned, so anything that fell out of the
+    buffer can be read back on demand with `loader(before_timestamp, limit)` (see older() / last()).
+    """
+    def __init__(self, capacity: int = 100,
+                 loader: Optional[Callable[[str, int], List[Dict[str, Any]]]] = None):
+        self.capacity = max(1, capacity)
+        self.loader = loader
+        self._items: List[Optional[Message]] = [None] * self.capacity
+        self._start = 0
+        self._len = 0
+
+    @classmethod
+    def from_dicts(cls, rows: List[Dict[str, Any]], capacity: int = 100, loader=None) -> "ConversationHistory":
+        history = cls(capacity, loader)
+        for r in rows[-history.capacity:]:
+            history.append(r["role"], r["content"], r.get("timestamp", ""))
+        return history
+
+    def append(self, role: str, content: str, timestamp: str = ""):
+        message = Message(role, content, timestamp)
+        if self._len < self.capacity:
+            self._items[(self._start + self._len) % self.capacity] = message
+            self._len += 1
+        else:
+            self._items[self._start] = message
+            self._start = (self._start + 1) % self.capacity
+
+    def __len__(self):
+        return self._len
+
+    def _at(self, i: int) -> Message:
+        return self._items[(self._start + i) % self.capacity]
+
+    def __getitem__(self, i: int) -> Message:
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError("history index out of range")
+        return self._at(i)
+
+    def __iter__(self) -> Iterator[Message]:
+        for i in range(self._len):
+            yield self._at(i)
+
+    def __reversed__(self) -> Iterator[Message]:
+        for i in range(self._len - 1, -1, -1):
+            yield self._at(i)
+
+    def older(self, limit: int) -> List[Message]:
+        """
+        Up to `limit` messages from just before the oldest buffered one, read from the database
+        (oldest first). They are not added to the buffer. Empty without a loader.
+        """
+        if self.loader is None or limit <= 0:
+            return []
+        before = self._at(0).timestamp if self._len else None
+        return [Message(r["role"], r["content"], r.get("timestamp", "")) for r in self.loader(before, limit)]
+
+    def last(self, n: int) -> Iterator[Message]:
+        """The last n messages in chronological order, reading older ones back from the database if n > len."""
+        if n > self._len:
+            yield from self.older(n - self._len)
+        for i in range(max(0, self._len - n), self._len):
+            yield self._at(i)
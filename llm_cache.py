@@ -0,0 +1,64 @@
+import hashlib
+import threading
+import time
+from typing import Optional, Dict, Any
+
+from tracing import tracer
+
+
+def cache_key(model_name: str, prompt: str) -> str:
+    """Content address of a model call: same model + same prompt -> same key."""
+    return hashlib.sha256(f"{model_name}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent cache of model responses stored in the llm_cache table.
+    Entries older than max_age_days are dropped, and once the cache grows past max_bytes the
+    least recently used entries go first. Hit/miss counters cover the life of this object.
+    """
+    def __init__(self, db, max_bytes: int = 50 * 1024 * 1024, max_age_days: Optional[float] = 90):
+        self.db = db
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400 if max_age_days else None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, model_name: str, prompt: str) -> Optional[str]:
+        key = cache_key(model_name, prompt)
+        now = time.time()
+        with self.db.transaction() as db:
+            response = db.get_cached_response(key, min_created_at=now - self.max_age if self.max_age else None)
+            if response is not None:
+                db.touch_cached_response(key, now)
+        with self._lock:
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        tracer.count("cache.misses" if response is None else "cache.hits")
+        return response
+
+    def put(self, model_name: str, prompt: str, response: str):
+        now = time.time()
+        with self.db.transaction() as db:
+            db.put_cached_response(cache_key(model_name, prompt), model_name, response, now)
+            evicted = db.evict_cached_responses(
+                max_bytes=self.max_bytes,
+                min_created_at=now - self.max_age if self.max_age else None,
+            )
+        if evicted:
+            with self._lock:
+                self.evictions += evicted
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,199 @@
+"""
+Load test for server.py: many simulated users chatting at once, reported as sessions/sec, turns/sec and
+latency percentiles (first turn of a session, which opens its database, vs. later turns).
+
+By default it starts an in-process server on a free port with the offline FakeBackend and a throwaway
+data directory, so it needs no API key and measures only our own overhead plus --latency:
+
+    python loadtest.py                                  # 50 users x 5 turns, fake model
+    python loadtest.py --users 200 --turns 10 --latency 0.2 --workers 64
+    python loadtest.py --stream                         # use /chat/stream
+    python loadtest.py --url http://127.0.0.1:8765      # against a server that's already running
+"""
+import argparse
+import asyncio
+import json
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from typing import List, Dict, Any, Optional, Tuple
+from urllib.parse import urlparse
+
+from backends import FakeBackend
+from server import ChatServer
+
+WORDS = "gym run read code study guitar sleep plan tired stuck skipped finished focus phone deadline".split()
+
+
+class Client:
+    """Minimal keep-alive HTTP/1.1 client, one connection per simulated user."""
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def post(self, path: str, payload: Dict[str, Any]) -> Tuple[int, bytes]:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload).encode("utf-8")
+        self.writer.write(
+            f"POST {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+        )
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if headers.get("transfer-encoding") == "chunked":
+            parts = []
+            while True:
+                size = int((await self.reader.readline()).strip(), 16)
+                data = await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                parts.append(data[:-2])
+            return status, b"".join(parts)
+        return status, await self.reader.readexactly(int(headers.get("content-length", 0)))
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+async def simulate_user(host: str, port: int, user: str, turns: int, path: str, think: float,
+                        rng: random.Random, results: Dict[str, list]):
+    client = Client(host, port)
+    try:
+        turn = 0
+        while turn < turns:
+            message = " ".join(rng.choices(WORDS, k=12))
+            t0 = time.perf_counter()
+            status, _ = await client.post(path, {"user": user, "message": message})
+            elapsed = time.perf_counter() - t0
+            if status == 429:
+                results["rate_limited"].append(elapsed)
+                await asyncio.sleep(0.5)
+                continue
+            if status != 200:
+                results["errors"].append(status)
+            else:
+                results["first" if turn == 0 else "later"].append(elapsed)
+                if turn == 0:
+                    results["session_ready"].append(time.perf_counter())
+            turn += 1
+            if think:
+                await asyncio.sleep(rng.uniform(0, think * 2))
+    finally:
+        await client.close()
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "p50_ms": statistics.median(ordered) * 1000,
+        "p99_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+async def run_load(host: str, port: int, users: int, turns: int, stream: bool, think: float,
+                   ramp: float, seed: int = 11) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    results: Dict[str, list] = {"first": [], "later": [], "rate_limited": [], "errors": [], "session_ready": []}
+    path = "/chat/stream" if stream else "/chat"
+    run_id = f"{int(time.time())}-{rng.randrange(1 << 16):04x}"
+
+    async def delayed(i):
+        if ramp:
+            await asyncio.sleep(ramp * i / users)
+        await simulate_user(host, port, f"load-{run_id}-{i}", turns, path, think, random.Random(seed + i), results)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(delayed(i) for i in range(users)))
+    wall = time.perf_counter() - t0
+
+    completed = len(results["first"]) + len(results["later"])
+    sessions_window = (max(results["session_ready"]) - t0) if results["session_ready"] else wall
+    return {
+        "users": users,
+        "turns_per_user": turns,
+        "wall_s": wall,
+        "sessions_per_sec": len(results["session_ready"]) / sessions_window if sessions_window else 0.0,
+        "turns_per_sec": completed / wall if wall else 0.0,
+        "first_turn": _percentiles(results["first"]),
+        "later_turns": _percentiles(results["later"]),
+        "rate_limited": len(results["rate_limited"]),
+        "errors": len(results["errors"]),
+    }
+
+
+def report(result: Dict[str, Any]):
+    print(f"\n{result['users']} users x {result['turns_per_user']} turns in {result['wall_s']:.2f}s")
+    print(f"  sessions/sec {result['sessions_per_sec']:8.1f}   turns/sec {result['turns_per_sec']:8.1f}   "
+          f"429s {result['rate_limited']}   errors {result['errors']}")
+    for label in ("first_turn", "later_turns"):
+        p = result[label]
+        if p["count"]:
+            print(f"  {label:<12} p50 {p['p50_ms']:8.1f} ms   p99 {p['p99_ms']:8.1f} ms   max {p['max_ms']:8.1f} ms   (n={p['count']})")
+
+
+async def main_async(args) -> Dict[str, Any]:
+    if args.url:
+        parsed = urlparse(args.url)
+        return await run_load(parsed.hostname, parsed.port or 80, args.users, args.turns, args.stream,
+                              args.think, args.ramp)
+
+    data_dir = tempfile.mkdtemp(prefix="localmind-load-")
+    server = ChatServer(data_dir, backend=FakeBackend(latency=args.latency), workers=args.workers,
+                        rate=args.rate, burst=args.burst, max_sessions=args.max_sessions,
+                        backfill_on_close=False)
+    try:
+        host, port = await server.start("127.0.0.1", 0)
+        print(f"in-process server on {host}:{port}, fake model latency {args.latency * 1000:.0f} ms, "
+              f"{args.workers} workers")
+        result = await run_load(host, port, args.users, args.turns, args.stream, args.think, args.ramp)
+        result["server"] = {k: v for k, v in server.stats().items() if k != "tracer"}
+        return result
+    finally:
+        await server.stop()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="target an already running server instead of starting one")
+    parser.add_argument("--users", type=int, default=50, help="concurrent simulated users")
+    parser.add_argument("--turns", type=int, default=5, help="turns per user")
+    parser.add_argument("--stream", action="store_true", help="use /chat/stream")
+    parser.add_argument("--think", type=float, default=0.0, help="mean pause between a user's turns (s)")
+    parser.add_argument("--ramp", type=float, default=0.0, help="spread user arrivals over this many seconds")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake model latency (in-process server only)")
+    parser.add_argument("--workers", type=int, default=32, help="server worker threads (in-process server only)")
+    parser.add_argument("--rate", type=float, default=100.0, help="per-user turns/sec (in-process server only)")
+    parser.add_argument("--burst", type=float, default=100.0, help="per-user burst (in-process server only)")
+    parser.add_argument("--max-sessions", type=int, default=1024, help="open sessions (in-process server only)")
+    parser.add_argument("--json", help="write the result to this file")
+    args = parser.parse_args()
+
+    result = asyncio.run(main_async(args))
+    report(result)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nresult written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,15 @@
-from chatbot import AccountabilityAI
 from database import Database
+from tracing import profile_session
 
 def main():
-    ai = AccountabilityAI()  # Initialize the AI once
-    
+    ai = None  # built on first chat; adding a goal only needs the Database
+
     while True:
         choice = input("\n(1) Chat  (2) Add Goal  (q) Quit: ")
         if choice == "1":
+            if ai is None:
+                from chatbot import AccountabilityAI
+                ai = AccountabilityAI()
             ai.run_chat()
         elif choice == "2":
             name = input("Goal name: ")
@@ -15,9 +18,23 @@ def main():
                 db.add_goal(name, desc)
             print("✅ Goal added")
         elif choice.lower() == "q" or choice.lower() == "quit":
+            if ai is not None and ai.backfill_job and ai.backfill_job.running:
+                print("Finishing background summaries (Ctrl+C to skip)...")
+                try:
+                    ai.backfill_job.wait()
+                except KeyboardInterrupt:
+                    # stop starting new days, but let the ones in flight commit before the pool closes
+                    print("Stopping after the days in progress...")
+                    ai.backfill_job.cancel()
+                    ai.backfill_job.wait()
+            if ai is not None:
+                ai.close()
             break
         else:
             print("Invalid choice.")
 
 if __name__ == "__main__":
-    main()
+    # LOCALMIND_PROFILE=session.prof dumps a cProfile of the whole session,
+    # LOCALMIND_TRACE=trace.jsonl writes per-stage timing spans (see tracing.py)
+    with profile_session():
+        main()
@@ -0,0 +1,80 @@
+import re
+from collections import Counter
+from typing import List, Dict, Tuple
+
+from tracing import tracer
+
+# BM25 parameters (standard defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by did do for from had has have i in is it its me my of on or so that the
+then there this to too was were what when which will with you your no not noted progress
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with stopwords and single characters dropped."""
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+def term_counts(text: str) -> Tuple[Dict[str, int], int]:
+    """(term -> frequency, document length) for one summary, as stored in the postings tables."""
+    tokens = tokenize(text)
+    return dict(Counter(tokens)), len(tokens)
+
+
+class SummaryIndex:
+    """
+    BM25 search over cleaned-log summaries.
+    The inverted index itself lives in the database (summary_postings / summary_docs) and is written
+    by Database.add_cleaned_log in the same transaction as the summary, so it never needs a rebuild.
+    A query reads only the postings for its own terms and scores them with NumPy.
+    """
+    def __init__(self, db, k1: float = BM25_K1, b: float = BM25_B):
+        self.db = db
+        self.k1 = k1
+        self.b = b
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[int, float]]:
+        """Return up to k (cleaned_log_id, score) pairs, best first. Empty if nothing matches."""
+        with tracer.span("retrieval.search"):
+            return self._search(query, k)
+
+    def _search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        # imported here so startup (and Database, which uses term_counts) doesn't pay for NumPy
+        import numpy as np
+
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or k <= 0:
+            return []
+
+        with self.db as db:
+            n_docs, total_len = db.get_summary_index_stats()
+            postings = db.get_summary_postings(terms)
+        if not postings or not n_docs:
+            return []
+
+        position = {t: i for i, t in enumerate(terms)}
+        term_idx = np.fromiter((position[p[0]] for p in postings), dtype=np.int64, count=len(postings))
+        doc_ids = np.fromiter((p[1] for p in postings), dtype=np.int64, count=len(postings))
+        tf = np.fromiter((p[2] for p in postings), dtype=np.float64, count=len(postings))
+        doc_len = np.fromiter((p[3] for p in postings), dtype=np.float64, count=len(postings))
+
+        df = np.bincount(term_idx, minlength=len(terms)).astype(np.float64)
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+        avgdl = total_len / n_docs if total_len else 1.0
+        contrib = idf[term_idx] * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * doc_len / avgdl))
+
+        unique_ids, inverse = np.unique(doc_ids, return_inverse=True)
+        scores = np.bincount(inverse, weights=contrib)
+
+        if len(scores) > k:
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(unique_ids[i]), float(scores[i])) for i in top]
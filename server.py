@@ -0,0 +1,395 @@
+"""
+Local multi-session chat server: a small asyncio HTTP/1.1 front end over AccountabilityAI.
+
+Each user gets their own session (and their own database file under --data-dir); sessions stay
+cached in memory, history included, until they sit idle or the cache is full. Model calls and
+SQLite work run on a thread pool so the event loop only shuffles bytes.
+
+    MODEL_BACKEND=fake python server.py --port 8765
+    curl -s localhost:8765/chat -d '{"user": "alice", "message": "I skipped the gym again"}'
+    curl -sN localhost:8765/chat/stream -d '{"user": "alice", "message": "what now?"}'
+    curl -s localhost:8765/stats
+
+Endpoints:
+    POST /chat          {"user", "message"} -> {"reply"}
+    POST /chat/stream   same body, reply streamed back as chunked text/plain
+    GET  /stats         session / rate-limit counters plus tracer stats
+    GET  /health
+Each user gets `rate` turns per second with bursts of `burst`; past that the answer is 429 with Retry-After.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Tuple
+
+from backends import ModelBackend, backend_from_env
+from tracing import tracer
+
+_USER_RE = re.compile(r"[A-Za-z0-9_.-]{1,64}")
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 429: "Too Many Requests", 500: "Internal Server Error"}
+_DONE = object()
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class TokenBucket:
+    """Non-blocking rate limit: `rate` tokens per second, holding at most `burst`."""
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Spend a token. Returns 0 on success, otherwise how many seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class Session:
+    """One user's AccountabilityAI plus the lock that keeps their turns in order."""
+    def __init__(self, user: str):
+        self.user = user
+        self.ai = None
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+
+class SessionStore:
+    """
+    LRU cache of open sessions. A session's AccountabilityAI (database, conversation ring buffer,
+    prompt caches) is opened on the user's first turn and closed when the session has been idle
+    for idle_seconds or is pushed out by max_sessions newer ones. Closing runs backfill first
+    (with backfill_on_close) so the conversation ends up in the cleaned logs.
+    """
+    def __init__(self, data_dir: str, backend: ModelBackend, executor: ThreadPoolExecutor,
+                 max_sessions: int = 256, idle_seconds: float = 900, backfill_on_close: bool = True):
+        self.data_dir = data_dir
+        self.backend = backend
+        self.executor = executor
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.backfill_on_close = backfill_on_close
+        self.opened = 0
+        self.closed = 0
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._closing = set()
+        os.makedirs(data_dir, exist_ok=True)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, user: str) -> Session:
+        session = self._sessions.get(user)
+        if session is None:
+            # make room first so the session being handed out can never be the one evicted;
+            # if every open session is busy we run over capacity until one frees up
+            self._evict_over_capacity(room_for=1)
+            session = self._sessions[user] = Session(user)
+        else:
+            self._sessions.move_to_end(user)
+        session.last_used = time.monotonic()
+        return session
+
+    async def ensure_open(self, session: Session):
+        """Open the session's AccountabilityAI on the thread pool if it isn't open yet."""
+        if session.ai is None:
+            session.ai = await asyncio.get_running_loop().run_in_executor(self.executor, self._open, session.user)
+            self.opened += 1
+
+    async def run(self, session: Session, fn, *args):
+        """Run fn(ai, *args) on the thread pool, opening the session's AccountabilityAI if needed."""
+        await self.ensure_open(session)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, session.ai, *args)
+
+    def _open(self, user: str):
+        from chatbot import AccountabilityAI
+
+        ai = AccountabilityAI(os.path.join(self.data_dir, f"{user}.db"), backend=self.backend)
+        ai.messages  # load history while we're off the event loop anyway
+        return ai
+
+    def _close(self, ai):
+        try:
+            if self.backfill_on_close:
+                ai.backfill_cleaned_logs()
+        finally:
+            ai.close()
+
+    def _evict(self, user: str):
+        session = self._sessions.pop(user)
+        if session.ai is not None:
+            future = asyncio.get_running_loop().run_in_executor(self.executor, self._close, session.ai)
+            self._closing.add(future)
+            future.add_done_callback(self._closing.discard)
+            self.closed += 1
+
+    def _evict_over_capacity(self, room_for: int = 0):
+        for user in list(self._sessions):
+            if len(self._sessions) + room_for <= self.max_sessions:
+                break
+            if not self._sessions[user].lock.locked():
+                self._evict(user)
+
+    def evict_idle(self):
+        cutoff = time.monotonic() - self.idle_seconds
+        for user, session in list(self._sessions.items()):
+            if session.last_used < cutoff and not session.lock.locked():
+                self._evict(user)
+
+    async def close_all(self):
+        for user in list(self._sessions):
+            session = self._sessions[user]
+            async with session.lock:  # let a turn in progress finish (and its AI finish opening)
+                if self._sessions.get(user) is session:
+                    self._evict(user)
+        if self._closing:
+            await asyncio.gather(*self._closing, return_exceptions=True)
+
+
+class ChatServer:
+    def __init__(self, data_dir: str = "sessions", backend: Optional[ModelBackend] = None,
+                 workers: int = 16, rate: float = 1.0, burst: float = 5.0, max_sessions: int = 256,
+                 idle_seconds: float = 900, backfill_on_close: bool = True, max_body: int = 64 * 1024):
+        self.backend = backend or backend_from_env()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chat")
+        self.sessions = SessionStore(data_dir, self.backend, self.executor, max_sessions=max_sessions,
+                                     idle_seconds=idle_seconds, backfill_on_close=backfill_on_close)
+        self.rate = rate
+        self.burst = burst
+        self.max_body = max_body
+        # buckets outlive sessions so closing one doesn't reset the user's allowance
+        self._buckets: Dict[str, TokenBucket] = {}
+        self.turns = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._sweeper: Optional[asyncio.Task] = None
+
+    # ---- Lifecycle ----
+    async def start(self, host: str = "127.0.0.1", port: int = 8765) -> Tuple[str, int]:
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        self._sweeper = asyncio.create_task(self._sweep())
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def stop(self):
+        if self._sweeper:
+            self._sweeper.cancel()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.sessions.close_all()
+        self.executor.shutdown(wait=True)
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(min(30.0, self.sessions.idle_seconds))
+            self.sessions.evict_idle()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": {"open": len(self.sessions), "opened": self.sessions.opened, "closed": self.sessions.closed},
+            "turns": self.turns,
+            "rate_limited": self.rate_limited,
+            "errors": self.errors,
+            "tracer": tracer.stats(),
+        }
+
+    # ---- HTTP ----
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    await self._route(method, path, body, writer)
+                except HTTPError as e:
+                    self._respond(writer, e.status, {"error": str(e)}, e.headers)
+                except Exception as e:
+                    self.errors += 1
+                    self._respond(writer, 500, {"error": str(e)})
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except HTTPError as e:
+            self._respond(writer, e.status, {"error": str(e)}, {"Connection": "close"})
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, path, _ = line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "malformed request line")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise HTTPError(400, "invalid Content-Length")
+        if length < 0:
+            raise HTTPError(400, "invalid Content-Length")
+        if length > self.max_body:
+            raise HTTPError(413, "request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), path.split("?", 1)[0], headers, body
+
+    def _respond(self, writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any],
+                 headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode("utf-8")
+        head = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}", "Content-Type: application/json",
+                f"Content-Length: {len(body)}"]
+        head += [f"{k}: {v}" for k, v in (headers or {}).items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+
+    async def _route(self, method: str, path: str, body: bytes, writer: asyncio.StreamWriter):
+        if path == "/health":
+            self._respond(writer, 200, {"ok": True})
+        elif path == "/stats":
+            self._respond(writer, 200, self.stats())
+        elif path in ("/chat", "/chat/stream"):
+            if method != "POST":
+                raise HTTPError(405, "use POST")
+            user, message = self._parse_chat(body)
+            self._check_rate(user)
+            session = self.sessions.get(user)
+            async with session.lock:
+                if path == "/chat":
+                    reply = await self.sessions.run(session, lambda ai, m: ai.generate_reply(m), message)
+                    self._respond(writer, 200, {"reply": reply})
+                else:
+                    await self._stream_reply(session, message, writer)
+                self.turns += 1
+                session.last_used = time.monotonic()
+        else:
+            raise HTTPError(404, f"no route for {path}")
+
+    def _parse_chat(self, body: bytes) -> Tuple[str, str]:
+        try:
+            data = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "body must be JSON")
+        user, message = data.get("user"), data.get("message")
+        if not isinstance(user, str) or not _USER_RE.fullmatch(user):
+            raise HTTPError(400, "user must be 1-64 characters of letters, digits, '.', '_' or '-'")
+        if not isinstance(message, str) or not message.strip():
+            raise HTTPError(400, "message must be a non-empty string")
+        return user, message
+
+    def _check_rate(self, user: str):
+        bucket = self._buckets.get(user)
+        if bucket is None:
+            bucket = self._buckets[user] = TokenBucket(self.rate, self.burst)
+        wait = bucket.take()
+        if wait:
+            self.rate_limited += 1
+            raise HTTPError(429, "rate limit exceeded", {"Retry-After": str(max(1, round(wait)))})
+
+    async def _stream_reply(self, session: Session, message: str, writer: asyncio.StreamWriter):
+        """Pump generate_reply_stream on a worker thread and relay each chunk as an HTTP chunk."""
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+        cancelled = threading.Event()
+
+        def pump(ai, text):
+            stream = ai.generate_reply_stream(text)
+            try:
+                for chunk in stream:
+                    if cancelled.is_set():
+                        break
+                    loop.call_soon_threadsafe(chunks.put_nowait, chunk)
+            except Exception as e:
+                loop.call_soon_threadsafe(chunks.put_nowait, e)
+            finally:
+                try:
+                    # stores the partial reply with INTERRUPTED_MARKER if we stopped early
+                    stream.close()
+                finally:
+                    loop.call_soon_threadsafe(chunks.put_nowait, _DONE)
+
+        # open the session before committing to a 200, so a failure here is an ordinary 500
+        await self.sessions.ensure_open(session)
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; charset=utf-8\r\nTransfer-Encoding: chunked\r\n\r\n")
+        worker = asyncio.ensure_future(self.sessions.run(session, pump, message))
+        try:
+            while True:
+                item = await chunks.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    self.errors += 1
+                    item = f"\n[error: {item}]"
+                data = item.encode("utf-8")
+                if not data:
+                    continue  # a zero-length chunk would end the body early
+                writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+                await writer.drain()
+            writer.write(b"0\r\n\r\n")
+        finally:
+            cancelled.set()
+            await worker
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--data-dir", default="sessions", help="one database file per user goes here")
+    parser.add_argument("--workers", type=int, default=16, help="threads for model calls and database work")
+    parser.add_argument("--rate", type=float, default=1.0, help="turns per second allowed per user")
+    parser.add_argument("--burst", type=float, default=5.0, help="turns a user can send back to back")
+    parser.add_argument("--max-sessions", type=int, default=256, help="sessions kept open in memory")
+    parser.add_argument("--idle-seconds", type=float, default=900, help="close sessions idle this long")
+    parser.add_argument("--no-backfill", action="store_true", help="skip summarizing when a session closes")
+    args = parser.parse_args()
+
+    async def serve():
+        server = ChatServer(args.data_dir, workers=args.workers, rate=args.rate, burst=args.burst,
+                            max_sessions=args.max_sessions, idle_seconds=args.idle_seconds,
+                            backfill_on_close=not args.no_backfill)
+        host, port = await server.start(args.host, args.port)
+        print(f"serving on http://{host}:{port} (backend: {server.backend.name}, data in {args.data_dir}/)")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            print("closing sessions...")
+            await server.stop()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+"""Shared setup for the tests: an AccountabilityAI on FakeBackend and a way to seed raw messages."""
+from backends import FakeBackend
+from chatbot import AccountabilityAI
+
+
+def make_ai(path, responder=None) -> AccountabilityAI:
+    ai = AccountabilityAI(str(path), backend=FakeBackend(responder=responder))
+    ai.archive_retention_days = None
+    return ai
+
+
+def add_messages(ai, day: str, *texts, hour: int = 10):
+    with ai.db as db:
+        for i, text in enumerate(texts):
+            db.add_message("user", text, f"{day}T{hour:02d}:{i:02d}:00")
+    ai.db.flush()
@@ -0,0 +1,52 @@
+"""Cold archive of summarized raw logs: codecs, what gets archived, and reading archived days back."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from archive import pack_logs, unpack_logs
+from helpers import make_ai, add_messages
+
+
+@pytest.mark.parametrize("codec", ["zlib", "lzma"])
+def test_pack_round_trip(codec):
+    rows = [(1, "user", "héllo", "2024-01-01T10:00:00"), (2, "assistant", "hi", "2024-01-01T10:00:05")]
+    assert unpack_logs(pack_logs(rows, codec), codec) == rows
+    with pytest.raises(ValueError):
+        pack_logs(rows, "brotli")
+
+
+def test_only_fully_summarized_days_are_archived(tmp_path):
+    ai = make_ai(tmp_path / "a.db", lambda prompt: '[{"goal_id": null, "summary": "ok"}]')
+    add_messages(ai, "2024-01-01", "day one")
+    add_messages(ai, "2024-01-02", "day two")
+    ai.backfill_cleaned_logs()
+    add_messages(ai, "2024-01-02", "after the summary", hour=20)
+
+    with ai.db as db:
+        assert db.archive_days("2024-01-03") == (1, 1)
+        stats = db.get_archive_stats()
+        assert (stats["archived_days"], stats["archived_messages"], stats["hot_messages"]) == (1, 1, 2)
+        assert [m["content"] for m in db.get_uncleaned_logs_for_day("2024-01-01")] == ["day one"]
+    ai.close()
+
+
+def test_history_survives_archiving(tmp_path):
+    ai = make_ai(tmp_path / "a.db", lambda prompt: '[{"goal_id": null, "summary": "ok"}]')
+    start = datetime(2024, 1, 1)
+    for d in range(5):
+        add_messages(ai, (start + timedelta(days=d)).date().isoformat(), f"day {d} a", f"day {d} b")
+    ai.backfill_cleaned_logs()
+    ai.archive_retention_days = 0
+    assert ai.archive_old_logs() == (5, 10)
+    ai.close()
+
+    ai = make_ai(tmp_path / "a.db")
+    ai.history_capacity = 4
+    assert [m.content for m in ai.messages] == ["day 3 a", "day 3 b", "day 4 a", "day 4 b"]
+    assert [m.content for m in ai.messages.older(3)] == ["day 1 b", "day 2 a", "day 2 b"]
+    with ai.db as db:
+        assert [m["content"] for m in db.get_uncleaned_logs_between("2024-01-02T04:00:00", "2024-01-03T04:00:00")] == ["day 1 a", "day 1 b"]
+        # a page that starts inside an archived day and spills into older ones
+        assert [m["content"] for m in db.get_uncleaned_logs_before("2024-01-04T10:01:00", 3)] == ["day 2 a", "day 2 b", "day 3 a"]
+        assert [m["content"] for m in db.get_uncleaned_logs(12)][:2] == ["day 0 a", "day 0 b"]
+    ai.close()
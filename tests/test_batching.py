@@ -0,0 +1,71 @@
+"""Multi-day batched summarization: packing days into calls, per-day fallback, and throttling."""
+import json
+
+from backfill import pack_batches
+from helpers import make_ai, add_messages
+
+
+def day(day_iso: str, chars: int, previous=None) -> tuple:
+    return (day_iso, [{"role": "user", "content": "x" * chars, "timestamp": f"{day_iso}T10:00:00"}], previous)
+
+
+def test_pack_batches_respects_budget_and_updates():
+    plan = [day("2024-01-01", 40), day("2024-01-02", 40), day("2024-01-03", 40),
+            day("2024-01-04", 10, previous=[]), day("2024-01-05", 500), day("2024-01-06", 10)]
+    batches = pack_batches(plan, batch_chars=100, batch_days=14)
+    assert sorted([d for d, _, _ in b] for b in batches) == [
+        ["2024-01-01", "2024-01-02"], ["2024-01-03"], ["2024-01-04"], ["2024-01-05"], ["2024-01-06"],
+    ]
+    assert [len(b) for b in pack_batches(plan[:3], batch_chars=1000, batch_days=2)] == [2, 1]
+    assert [len(b) for b in pack_batches(plan, batch_chars=0, batch_days=14)] == [1] * 6
+
+
+def batch_responder(prompts, skip=()):
+    def respond(prompt):
+        prompts.append(prompt)
+        if "keyed by date" in prompt:
+            days = prompt.rsplit("The keys must be exactly: ", 1)[1].strip(" .\n").split(", ")
+            return json.dumps({d: [{"goal_id": None, "summary": f"batched {d}"}] for d in days if d not in skip})
+        return '[{"goal_id": null, "summary": "single"}]'
+    return respond
+
+
+def test_sparse_days_share_one_call(tmp_path):
+    prompts = []
+    ai = make_ai(tmp_path / "a.db", batch_responder(prompts))
+    for d in range(1, 6):
+        add_messages(ai, f"2024-01-0{d}", f"note {d}")
+    ai.backfill_cleaned_logs()
+
+    assert len(prompts) == 1
+    with ai.db as db:
+        assert [c["summary"] for c in db.get_cleaned_logs_for_day("2024-01-03")] == ["batched 2024-01-03"]
+    ai.close()
+
+
+def test_missing_day_falls_back_to_its_own_call(tmp_path):
+    prompts = []
+    ai = make_ai(tmp_path / "a.db", batch_responder(prompts, skip={"2024-01-02"}))
+    for d in range(1, 4):
+        add_messages(ai, f"2024-01-0{d}", f"note {d}")
+    ai.backfill_cleaned_logs()
+
+    assert len(prompts) == 2
+    with ai.db as db:
+        assert [c["summary"] for c in db.get_cleaned_logs_for_day("2024-01-02")] == ["single"]
+        assert [c["summary"] for c in db.get_cleaned_logs_for_day("2024-01-03")] == ["batched 2024-01-03"]
+    ai.close()
+
+
+def test_throttle_skips_cache_hits(tmp_path):
+    prompts, waits = [], []
+    ai = make_ai(tmp_path / "a.db", batch_responder(prompts, skip={"2024-01-02"}))
+    days = [(f"2024-01-0{d}", [{"role": "user", "content": f"note {d}", "timestamp": f"2024-01-0{d}T10:00:00"}])
+            for d in range(1, 4)]
+    goals = []
+
+    ai.summarize_logs_for_days(days, goals, throttle=lambda: waits.append(1))
+    assert len(waits) == len(prompts) == 2  # the batch and one fallback
+    ai.summarize_logs_for_days(days, goals, throttle=lambda: waits.append(1))
+    assert len(waits) == len(prompts) == 2  # both answered from the response cache
+    ai.close()
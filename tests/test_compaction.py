@@ -0,0 +1,51 @@
+"""RollingSummary: folding old turns into a persisted running summary."""
+from compaction import RollingSummary
+from database import Database
+from history import ConversationHistory
+
+
+def make_history(n: int, chars: int = 100) -> ConversationHistory:
+    history = ConversationHistory(capacity=n)
+    for i in range(n):
+        history.append("user", f"{i:02d} " + "x" * chars, f"2024-05-01T10:00:{i:02d}")
+    return history
+
+
+def test_small_window_is_left_alone(tmp_path):
+    calls = []
+    compactor = RollingSummary(Database(str(tmp_path / "a.db")), calls.append, window_chars=6000)
+    assert not compactor.maybe_compact(make_history(10), background=False)
+    assert calls == [] and compactor.summary == ""
+
+
+def test_oldest_turns_are_folded_and_persisted(tmp_path):
+    db = Database(str(tmp_path / "a.db"))
+    prompts = []
+
+    def summarize(prompt):
+        prompts.append(prompt)
+        return " user is working through a long list "
+
+    compactor = RollingSummary(db, summarize, window_chars=1000, keep_chars=300, keep_messages=3)
+    history = make_history(20)
+    assert compactor.maybe_compact(history, background=False)
+
+    # the newest 3 messages (~300 chars) stay raw, everything older went into the prompt
+    assert "00 x" in prompts[0] and "16 x" in prompts[0] and "17 x" not in prompts[0]
+    assert compactor.summary == "user is working through a long list"
+    assert compactor.through == "2024-05-01T10:00:16"
+    assert [m.content[:2] for m in compactor.window(history)] == ["17", "18", "19"]
+
+    reopened = RollingSummary(db, summarize)
+    assert (reopened.summary, reopened.through) == (compactor.summary, compactor.through)
+
+
+def test_failed_fold_keeps_previous_summary(tmp_path):
+    def summarize(prompt):
+        raise RuntimeError("model unavailable")
+
+    compactor = RollingSummary(Database(str(tmp_path / "a.db")), summarize, window_chars=1000)
+    assert compactor.maybe_compact(make_history(20))
+    compactor.wait()
+    assert isinstance(compactor.error, RuntimeError)
+    assert compactor.summary == "" and compactor.through is None
@@ -0,0 +1,58 @@
+"""ContextBuilder: prompt sections trimmed to a budget and kept in sync with the database incrementally."""
+from context import ContextBuilder
+from database import Database
+from history import ConversationHistory
+
+
+def make_messages(n: int) -> ConversationHistory:
+    history = ConversationHistory(capacity=n)
+    for i in range(n):
+        history.append("user" if i % 2 == 0 else "assistant", f"message number {i:03d} " + "x" * 40,
+                       f"2024-05-01T10:{i // 60:02d}:{i % 60:02d}")
+    return history
+
+
+def test_conversation_keeps_newest_messages_within_budget(tmp_path):
+    db = Database(str(tmp_path / "a.db"))
+    builder = ContextBuilder(db, max_chars=2000, convo_share=0.5)
+    sections = builder.build(make_messages(80))
+
+    convo = sections["conversation"]
+    assert len(convo) <= 1000
+    lines = convo.splitlines()
+    assert "message number 079" in lines[-1]  # newest kept, in chronological order
+    assert "message number 000" not in convo
+
+
+def test_goals_and_summaries_share_the_budget(tmp_path):
+    db = Database(str(tmp_path / "a.db"))
+    with db.transaction() as d:
+        d.add_goal("Run", "three times a week")
+        d.add_goal("Read", "a chapter a day")
+        for day in range(1, 29):
+            d.add_cleaned_log(1, f"ran {day} km", f"2024-02-{day:02d}")
+    builder = ContextBuilder(db, max_chars=600, goal_share=0.25)
+    sections = builder.build([])
+
+    assert len(sections["goals"]) <= 150
+    assert sections["goals"].startswith("- Run:")  # the goal with recent progress goes first
+    assert len(sections["goals"]) + len(sections["cleaned"]) <= 600
+    assert sections["cleaned"].startswith("- (goal_id=1) 2024-02-28")  # newest summaries first
+
+
+def test_refresh_picks_up_new_and_replaced_rows(tmp_path):
+    db = Database(str(tmp_path / "a.db"))
+    with db.transaction() as d:
+        d.add_cleaned_log(None, "first day", "2024-02-01")
+    builder = ContextBuilder(db)
+    assert "first day" in builder.build([])["cleaned"]
+
+    with db.transaction() as d:
+        d.add_cleaned_log(None, "second day", "2024-02-02")
+    assert "second day" in builder.build([])["cleaned"]
+
+    with db.transaction() as d:
+        d.delete_cleaned_logs_for_day("2024-02-01")
+        d.add_cleaned_log(None, "first day, redone", "2024-02-01")
+    cleaned = builder.build([])["cleaned"]
+    assert "first day, redone" in cleaned and "first day\n" not in cleaned
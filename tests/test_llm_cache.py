@@ -0,0 +1,61 @@
+"""ResponseCache: content-addressed hits, LRU eviction by size, expiry by age, and call_ai_model's use of it."""
+from types import SimpleNamespace
+
+import llm_cache
+from database import Database
+from helpers import make_ai
+from llm_cache import ResponseCache, cache_key
+
+
+class Clock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+def test_key_depends_on_model_and_prompt():
+    assert cache_key("m", "p") == cache_key("m", "p")
+    assert cache_key("m", "p") != cache_key("other", "p")
+    assert cache_key("m", "p") != cache_key("m", "p2")
+
+
+def test_hit_miss_and_lru_eviction(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache, "time", SimpleNamespace(time=clock.time))
+    cache = ResponseCache(Database(str(tmp_path / "a.db")), max_bytes=250, max_age_days=None)
+
+    assert cache.get("m", "a") is None
+    for prompt in ("a", "b"):
+        clock.now += 1
+        cache.put("m", prompt, prompt * 100)
+    clock.now += 1
+    assert cache.get("m", "a") == "a" * 100  # a is now more recently used than b
+
+    clock.now += 1
+    cache.put("m", "c", "c" * 100)  # 300 bytes > 250: the least recently used entry goes
+    assert cache.get("m", "b") is None
+    assert cache.get("m", "a") == "a" * 100 and cache.get("m", "c") == "c" * 100
+    assert cache.stats()["evictions"] == 1
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (3, 2)
+
+
+def test_entries_expire(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache, "time", SimpleNamespace(time=clock.time))
+    cache = ResponseCache(Database(str(tmp_path / "a.db")), max_age_days=1)
+    cache.put("m", "a", "old")
+    clock.now += 86400 + 1
+    assert cache.get("m", "a") is None
+
+
+def test_call_ai_model_caches_unless_told_not_to(tmp_path):
+    ai = make_ai(tmp_path / "a.db", lambda prompt: "reply")
+    assert ai.call_ai_model("summarize this") == "reply"
+    assert ai.call_ai_model("summarize this") == "reply"
+    assert ai.backend.calls == 1
+    ai.call_ai_model("chat turn", use_cache=False)
+    ai.call_ai_model("chat turn", use_cache=False)
+    assert ai.backend.calls == 3
+    ai.close()
@@ -0,0 +1,51 @@
+"""Schema migrations: an unversioned database from before PRAGMA user_version is upgraded in place."""
+import sqlite3
+
+from database import Database, MIGRATIONS
+
+# schema as created by the original, unversioned Database
+BASELINE_SCHEMA = """
+CREATE TABLE goals (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, description TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+CREATE TABLE logs_uncleaned (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                             role TEXT CHECK(role IN ('user','assistant')) DEFAULT 'user',
+                             message TEXT NOT NULL, created_at TEXT NOT NULL);
+CREATE TABLE logs_cleaned (id INTEGER PRIMARY KEY AUTOINCREMENT, goal_id INTEGER, summary TEXT NOT NULL,
+                           date DATE DEFAULT CURRENT_DATE, FOREIGN KEY (goal_id) REFERENCES goals (id));
+"""
+
+
+def test_baseline_db_upgrades_to_latest(tmp_path):
+    path = tmp_path / "old.db"
+    with sqlite3.connect(path) as conn:
+        conn.executescript(BASELINE_SCHEMA)
+        conn.execute("INSERT INTO logs_uncleaned (role, message, created_at) VALUES ('user', 'late night', '2024-03-02T03:00:00')")
+        conn.execute("INSERT INTO logs_uncleaned (role, message, created_at) VALUES ('user', 'morning', '2024-03-02T09:00:00')")
+        conn.execute("INSERT INTO logs_cleaned (goal_id, summary, date) VALUES (NULL, 'old summary', '2024-03-01')")
+
+    db = Database(str(path))
+    with db:
+        assert db.conn.execute("PRAGMA user_version").fetchone()[0] == len(MIGRATIONS)
+        days = [r[0] for r in db.conn.execute("SELECT day FROM logs_uncleaned ORDER BY id")]
+        assert days == ["2024-03-01", "2024-03-02"]  # before the 4am cutoff counts as the previous day
+        # the already summarized day is covered by a watermark, the other one isn't
+        assert db.get_day_watermarks(["2024-03-01", "2024-03-02"]) == {"2024-03-01": 1}
+        assert db.get_summarized_through_id() == 1
+        assert db.get_archive_stats()["archived_days"] == 0
+        assert db.get_uncleaned_logs_for_day("2024-03-02")[0]["content"] == "morning"
+        # the summary index was built for the existing row
+        assert db.get_summary_index_stats()[0] == 1
+
+
+def test_reopening_does_not_rerun_migrations(tmp_path):
+    path = str(tmp_path / "new.db")
+    db = Database(path)
+    with db:
+        db.add_message("user", "hello", "2024-03-02T09:00:00")
+    db.close()
+
+    db = Database(path)
+    with db:
+        assert db.conn.execute("PRAGMA user_version").fetchone()[0] == len(MIGRATIONS)
+        assert [m["content"] for m in db.get_uncleaned_logs()] == ["hello"]
+    db.close()
@@ -0,0 +1,47 @@
+"""BM25 search over cleaned summaries and the retrieval-based cleaned-log section."""
+from context import ContextBuilder
+from database import Database
+from retrieval import SummaryIndex, tokenize
+
+
+def seed(db: Database) -> dict:
+    ids = {}
+    with db.transaction() as d:
+        ids["guitar"] = d.add_cleaned_log(None, "Practiced guitar scales for an hour", "2024-01-03")
+        for day in range(4, 28):
+            d.add_cleaned_log(None, f"Worked on the thesis draft, section {day}", f"2024-01-{day:02d}")
+    return ids
+
+
+def test_tokenize_drops_stopwords_and_short_tokens():
+    assert tokenize("I did a 5k run and read a Chapter") == ["5k", "run", "read", "chapter"]
+
+
+def test_search_ranks_matching_summary_first(tmp_path):
+    db = Database(str(tmp_path / "a.db"))
+    ids = seed(db)
+    index = SummaryIndex(db)
+    results = index.search("how is my guitar practice going", k=3)
+    assert results[0][0] == ids["guitar"]
+    assert len(results) == 1  # no other summary mentions those terms
+    assert index.search("nothing relevant here") == []
+
+
+def test_index_follows_deleted_summaries(tmp_path):
+    db = Database(str(tmp_path / "a.db"))
+    seed(db)
+    with db.transaction() as d:
+        d.delete_cleaned_logs_for_day("2024-01-03")
+    assert SummaryIndex(db).search("guitar") == []
+    assert len(SummaryIndex(db).search("thesis", k=50)) == 24
+
+
+def test_context_pulls_in_old_relevant_summary(tmp_path):
+    db = Database(str(tmp_path / "a.db"))
+    seed(db)
+    builder = ContextBuilder(db, max_chars=1200, index=SummaryIndex(db), top_k=2, recent_k=3)
+    messages = [{"role": "user", "content": "I picked up the guitar again", "timestamp": "2024-01-28T10:00:00"}]
+    cleaned = builder.build(messages)["cleaned"]
+    assert "guitar scales" in cleaned  # oldest summary, but the relevant one
+    assert "section 27" in cleaned  # plus the latest few
+    assert "section 10" not in cleaned
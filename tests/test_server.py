@@ -0,0 +1,76 @@
+"""The async chat server end to end, on a free port with FakeBackend."""
+import asyncio
+import json
+import os
+
+from backends import FakeBackend
+from loadtest import Client
+from server import ChatServer
+
+
+def serve(tmp_path, scenario, **kwargs):
+    """Start a server, run `await scenario(server, client)` against it, and always stop it."""
+    kwargs.setdefault("rate", 100.0)
+    kwargs.setdefault("burst", 100.0)
+
+    async def main():
+        server = ChatServer(str(tmp_path), backend=FakeBackend(), backfill_on_close=False, **kwargs)
+        host, port = await server.start("127.0.0.1", 0)
+        client = Client(host, port)
+        try:
+            return await scenario(server, client)
+        finally:
+            await client.close()
+            await asyncio.wait_for(server.stop(), 10)
+
+    return asyncio.run(main())
+
+
+def test_chat_and_stream_share_a_session(tmp_path):
+    async def scenario(server, client):
+        status, body = await client.post("/chat", {"user": "amy", "message": "I went for a run"})
+        assert status == 200 and json.loads(body)["reply"]
+        status, body = await client.post("/chat/stream", {"user": "amy", "message": "and read a chapter"})
+        assert status == 200 and body.decode("utf-8").startswith("Noted.")
+        # requests on one connection are handled in order, so this sees both turns counted
+        status, body = await client.post("/stats", {})
+        return json.loads(body)
+
+    stats = serve(tmp_path, scenario)
+    assert stats["turns"] == 2 and stats["errors"] == 0
+    assert stats["sessions"]["opened"] == 1
+
+
+def test_rate_limit_answers_429(tmp_path):
+    async def scenario(server, client):
+        statuses = []
+        for _ in range(3):
+            statuses.append((await client.post("/chat", {"user": "amy", "message": "hi"}))[0])
+        other, _ = await client.post("/chat", {"user": "bob", "message": "hi"})
+        return statuses, other, server.stats()["rate_limited"]
+
+    statuses, other, limited = serve(tmp_path, scenario, rate=0.01, burst=2)
+    assert statuses == [200, 200, 429]
+    assert other == 200  # buckets are per user
+    assert limited == 1
+
+
+def test_bad_requests(tmp_path):
+    async def scenario(server, client):
+        missing_user = (await client.post("/chat", {"message": "hi"}))[0]
+        empty_message = (await client.post("/chat", {"user": "amy", "message": " "}))[0]
+        unknown = (await client.post("/nope", {}))[0]
+        return missing_user, empty_message, unknown
+
+    assert serve(tmp_path, scenario) == (400, 400, 404)
+
+
+def test_session_that_fails_to_open_is_a_500(tmp_path):
+    os.mkdir(tmp_path / "amy.db")  # a directory where the database file should be
+
+    async def scenario(server, client):
+        stream = (await client.post("/chat/stream", {"user": "amy", "message": "hi"}))[0]
+        plain = (await client.post("/chat", {"user": "amy", "message": "hi"}))[0]
+        return stream, plain, server.stats()["errors"]
+
+    assert serve(tmp_path, scenario) == (500, 500, 2)
@@ -0,0 +1,24 @@
+"""Lazy startup: construction only opens the database; history and the model come in on first use."""
+from backends import FakeBackend
+from chatbot import AccountabilityAI
+from helpers import make_ai
+
+
+def test_construction_defers_history_and_backend(tmp_path, monkeypatch):
+    monkeypatch.setenv("MODEL_BACKEND", "fake")
+    ai = AccountabilityAI(str(tmp_path / "a.db"))
+    assert ai._backend is None and ai._messages is None
+    assert len(ai.messages) == 0
+    assert isinstance(ai.backend, FakeBackend)
+    ai.close()
+
+
+def test_first_turn_is_not_duplicated(tmp_path):
+    ai = make_ai(tmp_path / "a.db")
+    ai.generate_reply("hello there")
+    ai.close()
+    ai = make_ai(tmp_path / "a.db")
+    ai.generate_reply("again")
+    assert [(m.role, m.content) for m in ai.messages][::2] == [("user", "hello there"), ("user", "again")]
+    assert len(ai.messages) == 4
+    ai.close()
@@ -0,0 +1,67 @@
+"""Per-day watermarks: late messages update a summarized day, failed calls leave it to be retried."""
+from helpers import make_ai, add_messages
+
+
+def test_late_messages_update_summarized_day(tmp_path):
+    prompts = []
+
+    def responder(prompt):
+        prompts.append(prompt)
+        if "already summarized" in prompt:
+            return '[{"goal_id": null, "summary": "ran and then swam"}]'
+        return '[{"goal_id": null, "summary": "ran"}]'
+
+    ai = make_ai(tmp_path / "a.db", responder)
+    add_messages(ai, "2024-05-01", "went for a run")
+    ai.backfill_cleaned_logs()
+    with ai.db as db:
+        first_mark = db.get_day_watermarks(["2024-05-01"])["2024-05-01"]
+
+    add_messages(ai, "2024-05-01", "also swam", hour=20)
+    ai.backfill_cleaned_logs()
+
+    update_prompt = prompts[-1]
+    assert "already summarized" in update_prompt
+    assert "also swam" in update_prompt and "went for a run" not in update_prompt  # only the new messages
+    with ai.db as db:
+        assert [c["summary"] for c in db.get_cleaned_logs_for_day("2024-05-01")] == ["ran and then swam"]
+        assert db.get_day_watermarks(["2024-05-01"])["2024-05-01"] > first_mark
+    assert ai.plan_backfill()[0] == []
+    ai.close()
+
+
+def test_unparseable_update_keeps_previous_summaries(tmp_path):
+    def responder(prompt):
+        if "already summarized" in prompt:
+            return "Swam too, nice."
+        return '[{"goal_id": null, "summary": "ran"}]'
+
+    ai = make_ai(tmp_path / "a.db", responder)
+    add_messages(ai, "2024-05-01", "went for a run")
+    ai.backfill_cleaned_logs()
+    add_messages(ai, "2024-05-01", "also swam", hour=20)
+    ai.backfill_cleaned_logs()
+
+    with ai.db as db:
+        summaries = [c["summary"] for c in db.get_cleaned_logs_for_day("2024-05-01")]
+    assert summaries == ["ran", "Swam too, nice."]  # no raw user messages in the summary
+    ai.close()
+
+
+def test_failed_model_call_leaves_watermark(tmp_path):
+    def outage(prompt):
+        raise RuntimeError("model unavailable")
+
+    ai = make_ai(tmp_path / "a.db", outage)
+    add_messages(ai, "2024-05-01", "went for a run")
+    add_messages(ai, "2024-05-02", "read a chapter")
+
+    job = ai.start_backfill(rate_per_sec=None)
+    job.wait()
+    assert job.progress()["failed"] == 2 and job.progress()["done"] == 0
+    with ai.db as db:
+        assert db.get_day_watermarks(["2024-05-01", "2024-05-02"]) == {}
+        assert db.get_summarized_through_id() == 0
+        assert db.get_cleaned_logs() == []
+    assert len(ai.plan_backfill()[0]) == 2  # retried next time
+    ai.close()
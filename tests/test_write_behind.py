@@ -0,0 +1,33 @@
+"""The write-behind message writer used in durability="batched" mode."""
+import pytest
+
+from database import Database, WriteBehindError
+
+
+def test_batched_writer_keeps_good_rows(tmp_path):
+    db = Database(str(tmp_path / "a.db"), persistent=True, durability="batched", flush_interval=5)
+    with db:
+        db.add_message("user", "first")
+        db.add_message("robot", "violates the role CHECK")
+        db.add_message("assistant", "second")
+    with pytest.raises(WriteBehindError) as err:
+        db.flush()
+    assert [row[0] for row in err.value.rows] == ["robot"]
+    with db:
+        # flush_interval is 5s, so this also checks that reads wake the writer instead of waiting it out
+        db.add_message("user", "third")
+        assert [m["content"] for m in db.get_uncleaned_logs()] == ["first", "second", "third"]
+    db.close()
+
+
+def test_close_writes_queued_rows(tmp_path):
+    path = str(tmp_path / "a.db")
+    db = Database(path, persistent=True, durability="batched", flush_size=1000, flush_interval=60)
+    with db:
+        for i in range(10):
+            db.add_message("user", f"message {i}")
+    db.close()
+
+    db = Database(path)
+    with db:
+        assert [m["content"] for m in db.get_uncleaned_logs()] == [f"message {i}" for i in range(10)]
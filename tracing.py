@@ -0,0 +1,163 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+# Set to a file path to turn tracing on at import time (one JSON object per finished span).
+TRACE_ENV_VAR = "LOCALMIND_TRACE"
+# Set to a file path to dump a cProfile of the session there (see profile_session).
+PROFILE_ENV_VAR = "LOCALMIND_PROFILE"
+
+# how many recent durations per span are kept for percentiles
+_SAMPLES_PER_SPAN = 1000
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "attrs", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, attrs: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.tracer._record(self.name, elapsed, self.attrs)
+        return False
+
+    def set(self, **attrs):
+        """Attach attributes discovered inside the span (sizes, counts...)."""
+        self.attrs.update(attrs)
+
+
+class Tracer:
+    """
+    Timing spans and counters for the hot paths.
+    Disabled (the default) it hands out a shared no-op span and ignores counters, so instrumented
+    code pays one attribute check. Enabled it keeps per-span latency stats in memory and, when
+    given a path, appends each finished span to a JSONL trace file.
+
+        with tracer.span("turn.model", prompt_chars=len(prompt)) as span:
+            ...
+            span.set(reply_chars=len(reply))
+        tracer.count("model.calls")
+        tracer.stats()
+    """
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._file = None
+        self._durations: Dict[str, deque] = defaultdict(lambda: deque(maxlen=_SAMPLES_PER_SPAN))
+        self._totals: Dict[str, list] = defaultdict(lambda: [0, 0.0])  # name -> [count, total seconds]
+        self._counters: Dict[str, int] = defaultdict(int)
+
+    def enable(self, trace_path: Optional[str] = None):
+        with self._lock:
+            if trace_path and self._file is None:
+                self._file = open(trace_path, "a", buffering=1, encoding="utf-8")
+            self.enabled = True
+
+    def disable(self):
+        with self._lock:
+            self.enabled = False
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def reset(self):
+        with self._lock:
+            self._durations.clear()
+            self._totals.clear()
+            self._counters.clear()
+
+    def span(self, name: str, **attrs):
+        if not self.enabled:
+            return _NOOP
+        return _Span(self, name, attrs)
+
+    def count(self, name: str, n: int = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] += n
+
+    def _record(self, name: str, elapsed: float, attrs: Dict[str, Any]):
+        with self._lock:
+            self._durations[name].append(elapsed)
+            totals = self._totals[name]
+            totals[0] += 1
+            totals[1] += elapsed
+            if self._file is not None:
+                event = {"ts": time.time(), "span": name, "ms": round(elapsed * 1000, 3),
+                         "thread": threading.current_thread().name}
+                event.update(attrs)
+                self._file.write(json.dumps(event, default=str) + "\n")
+
+    def stats(self) -> Dict[str, Any]:
+        """{"spans": {name: {count, total_ms, p50_ms, p99_ms, max_ms}}, "counters": {name: n}}"""
+        with self._lock:
+            spans = {}
+            for name, samples in self._durations.items():
+                ordered = sorted(samples)
+                count, total = self._totals[name]
+                spans[name] = {
+                    "count": count,
+                    "total_ms": total * 1000,
+                    "p50_ms": ordered[len(ordered) // 2] * 1000,
+                    "p99_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+                    "max_ms": ordered[-1] * 1000,
+                }
+            return {"spans": spans, "counters": dict(self._counters)}
+
+
+# Process-wide tracer used by the instrumented modules.
+tracer = Tracer()
+if os.getenv(TRACE_ENV_VAR):
+    tracer.enable(os.getenv(TRACE_ENV_VAR))
+
+
+@contextmanager
+def profile_session(path: Optional[str] = None):
+    """
+    Run the enclosed block under cProfile and dump the stats to `path` (default: $LOCALMIND_PROFILE).
+    Does nothing when no path is given. Inspect with `python -m pstats <path>`.
+    """
+    path = path or os.getenv(PROFILE_ENV_VAR)
+    if not path:
+        yield
+        return
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)